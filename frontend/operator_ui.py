@@ -25,60 +25,98 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@st.cache_data(ttl=300)  # Cache di 5 minuti
-def load_all_data():
-    """Carica tutti i record dal database tramite API Gateway."""
-    try:
-        # Recupera il token JWT dalla sessione
+REPORTS_PAGE_SIZE = 50
+
 
+@st.cache_data(ttl=60)
+def load_reports_page(token, after_id=None, date_from=None, date_to=None, limit=REPORTS_PAGE_SIZE):
+    """
+    Carica una pagina di report (dal più recente) tramite API Gateway.
+    Restituisce (DataFrame, id da passare come after_id per la pagina successiva oppure None).
+    """
+    try:
         headers = {
-            "Authorization": f"Bearer {st.session_state.token}",
+            "Authorization": f"Bearer {token}",
             "Content-Type": "application/json"
         }
+        params = {
+            "limit": limit,
+            "fields": "patient_id,social_sec_number,date,sintomi,diagnosi,trattamento,created_at",
+            # nome e cognome dei pazienti della pagina, recuperati da auth con una sola chiamata batch
+            "with_patient": "true",
+        }
+        if after_id:
+            params["after_id"] = after_id
+        if date_from:
+            params["date_from"] = date_from.isoformat()
+        if date_to:
+            params["date_to"] = date_to.isoformat()
+
+        # Chiamata all'API Gateway per ottenere solo la pagina richiesta
+        response = requests.get(f"{URL_GATEWAY}/reports", headers=headers, params=params)
 
-        # Chiamata all'API Gateway per ottenere tutti i report
-        response = requests.get(f"{URL_GATEWAY}/reports", headers=headers)
-        
         if response.status_code == 200:
-            reports_data = response.json()
-            
-            # Converti i dati in DataFrame
-            if isinstance(reports_data, list) and len(reports_data) > 0:
-                # Normalizza i dati per gestire diverse strutture
-                normalized_data = []
-                for report in reports_data:
-                    # Gestisci diversi formati di ID
-                    record_id = report.get('_id', {}).get('$oid', '') if isinstance(report.get('_id'), dict) else report.get('_id', '')
-                    
-                    normalized_report = {
-                        'record_id': str(record_id),
-                        'patient_id': report.get('patient_id', ''),
-                        'firstname': report.get('firstname', ''),
-                        'lastname': report.get('lastname', ''),
-                        'social_sec_number': report.get('social_sec_number', ''),
-                        'date': pd.to_datetime(report.get('date', '')),
-                        'sintomi': report.get('sintomi', ''),
-                        'diagnosi': report.get('diagnosi', ''),
-                        'trattamento': report.get('trattamento', ''),
-                        'created_at': pd.to_datetime(report.get('created_at', ''))
-                    }
-                    normalized_data.append(normalized_report)
-                
-                df = pd.DataFrame(normalized_data)
-                return df
-            else:
-                st.info("Nessun report trovato nel database.")
-                return pd.DataFrame()
+            page = response.json()
+            df = pd.DataFrame(page["items"])
+            if not df.empty:
+                df = df.rename(columns={"id": "record_id"})
+                df['date'] = pd.to_datetime(df['date'], errors="coerce")
+                df['created_at'] = pd.to_datetime(df['created_at'], errors="coerce")
+            return df, page.get("next_after_id")
         else:
             st.error(f"Errore nel caricamento dei dati: {response.status_code} - {response.text}")
-            return pd.DataFrame()
+            return pd.DataFrame(), None
 
     except requests.exceptions.ConnectionError:
         st.error("Impossibile connettersi all'API Gateway. Verifica che il servizio sia in esecuzione.")
-        return pd.DataFrame()
+        return pd.DataFrame(), None
     except Exception as e:
         st.error(f"Errore durante il caricamento dei dati: {str(e)}")
-        return pd.DataFrame()
+        return pd.DataFrame(), None
+
+
+def render_reports_browser():
+    """Elenco dei report più recenti, caricati dal gateway una pagina alla volta."""
+    st.markdown("### 📋 Ultimi report")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        date_from = st.date_input("Dal:", value=None, format="DD/MM/YYYY", key="reports_date_from")
+    with col2:
+        date_to = st.date_input("Al:", value=None, format="DD/MM/YYYY", key="reports_date_to")
+
+    # cursori delle pagine già visitate: l'ultimo è quello della pagina mostrata
+    filters = (date_from, date_to)
+    if st.session_state.get("reports_filters") != filters:
+        st.session_state.reports_filters = filters
+        st.session_state.reports_cursors = [None]
+    cursors = st.session_state.reports_cursors
+
+    df, next_after_id = load_reports_page(st.session_state.token, cursors[-1], date_from, date_to)
+    if df.empty:
+        st.info("Nessun report trovato con i filtri attuali.")
+    else:
+        columns = [c for c in ['date', 'lastname', 'firstname', 'social_sec_number', 'sintomi', 'diagnosi', 'trattamento'] if c in df.columns]
+        st.dataframe(
+            df[columns],
+            use_container_width=True,
+            hide_index=True,
+        )
+
+    col1, col2, col3 = st.columns([1.5, 3, 1.5])
+    with col1:
+        if st.button("< Prec.", use_container_width=True, disabled=len(cursors) == 1, key="reports_prev"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.markdown(
+            f"<p style='text-align: center; margin-top: 0.4rem;'>Pagina <b>{len(cursors)}</b></p>",
+            unsafe_allow_html=True
+        )
+    with col3:
+        if st.button("Succ. >", use_container_width=True, disabled=next_after_id is None, key="reports_next"):
+            cursors.append(next_after_id)
+            st.rerun()
 
 
 @st.cache_data(ttl=60)
@@ -443,12 +481,7 @@ def interface():
             st.cache_data.clear()
             st.rerun()
     
-    '''
-    df = load_all_data()
-    if df.empty:
-        st.warning("⚠️ Nessun dato trovato nel database.")
-        return
-    '''
+    render_reports_browser()
 
 
 
@@ -505,6 +538,31 @@ def alt_interface():
 
                     render_query_results(df)
 
+    # === EXPORT DI TUTTI I PDF DEL PAZIENTE IN UN UNICO ZIP ===
+    if search_text.strip() and st.button("📦 Prepara export PDF (ZIP)", use_container_width=True):
+        with st.spinner("Genero i PDF del paziente..."):
+            response = requests.get(
+                f"{URL_GATEWAY}/reports/export",
+                headers=headers,
+                params={"social_sec_number": search_text.strip()},
+                timeout=300,
+            )
+        if response.status_code == 200:
+            st.download_button(
+                label="📥 Scarica ZIP",
+                data=response.content,
+                file_name=f"reports_{search_text.strip()}.zip",
+                mime="application/zip",
+                use_container_width=True,
+            )
+        elif response.status_code == 404:
+            st.warning("⚠️ Nessun report disponibile per il paziente.")
+        else:
+            st.error(f"Errore nell'export dei PDF: {response.status_code}")
+
+    st.divider()
+    render_reports_browser()
+
     # === PULSANTE PER RICARICARE I DATI (opzionale) ===
     st.divider()
     if st.button("🔄 Aggiorna dati", use_container_width=True):
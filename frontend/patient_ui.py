@@ -175,6 +175,8 @@ def symptom_interface():
                             st.success("✅ Elaborazione completata!")
                             st.write("**Decisione**:", response["decisione"])
                             st.write("**Motivazione**:", response["motivazione"])
+                            if response.get("report_salvato") is False:
+                                st.warning("⚠️ Dati anagrafici non disponibili: il report non è stato salvato. Riprova più tardi.")
                             
                             if input_mode in ["🎙️ Registra audio", "📁 Carica file audio"]:
                                 os.remove(st.session_state.audio_path)
@@ -0,0 +1,34 @@
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+"""
+Sorgente della data corrente per il calcolo dell'età.
+
+La data va letta ad ogni richiesta (non una volta all'avvio), altrimenti per i
+processi che restano attivi a lungo le età smettono di aggiornarsi. Nei test si
+può passare un FixedClock al posto del SystemClock (vedi testing/check_patient_context.py).
+"""
+
+
+class Clock(ABC):
+    @abstractmethod
+    def today(self) -> date:
+        ...
+
+
+class SystemClock(Clock):
+    def __init__(self, tz: str = None):
+        # senza fuso esplicito si usa quello locale del container
+        self._tz = ZoneInfo(tz) if tz else None
+
+    def today(self) -> date:
+        return datetime.now(self._tz).date()
+
+
+class FixedClock(Clock):
+    def __init__(self, today: date):
+        self._today = today
+
+    def today(self) -> date:
+        return self._today
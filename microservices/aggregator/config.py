@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+from http_client import settings_from_env
 
 # Carica il file .env
 load_dotenv()
@@ -8,4 +9,29 @@ load_dotenv()
 AUTH_SERVICE_URL = os.getenv("AUTH_SERVICE_URL")
 ROUTE_AUTH_SERVICE = os.getenv("ROUTE_AUTH_SERVICE")
 REPORT_SERVICE_URL = os.getenv("REPORT_SERVICE_URL")
-ROUTE_REPORT_SERVICE= os.getenv("ROUTE_REPORT_SERVICE")
\ No newline at end of file
+ROUTE_REPORT_SERVICE= os.getenv("ROUTE_REPORT_SERVICE")
+ROUTE_REPORT_CONTEXT = os.getenv("ROUTE_REPORT_CONTEXT", "/reports/context")
+
+# Storico clinico passato al decision engine: solo gli ultimi N report, più (opzionale)
+# un riepilogo dei precedenti, così il contesto resta limitato anche per i pazienti cronici
+REPORT_HISTORY_LIMIT = int(os.getenv("REPORT_HISTORY_LIMIT", 5))
+REPORT_HISTORY_SUMMARY = os.getenv("REPORT_HISTORY_SUMMARY", "true").lower() == "true"
+
+# Impostazioni dei client httpx verso auth e report (variabili AUTH_SERVICE_* e REPORT_SERVICE_*)
+AUTH_CLIENT_SETTINGS = settings_from_env("AUTH_SERVICE")
+REPORT_CLIENT_SETTINGS = settings_from_env("REPORT_SERVICE")
+
+# Tempo massimo (secondi) per ciascuna chiamata verso auth e report: oltre viene restituito
+# un contesto parziale con "degraded": true. Di default è il read timeout dei client (come
+# prima della deadline): con auth lento il decision engine non salverebbe il report,
+# perché senza anagrafica manca il codice fiscale
+AUTH_DEADLINE = float(os.getenv("AUTH_DEADLINE", AUTH_CLIENT_SETTINGS.read_timeout))
+REPORT_DEADLINE = float(os.getenv("REPORT_DEADLINE", REPORT_CLIENT_SETTINGS.read_timeout))
+
+# Cache del contesto paziente: i profili cambiano di rado, i report vengono invalidati dalle
+# notifiche di report-management (il TTL dei report copre eventuali notifiche perse)
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", 3600))
+REPORTS_CACHE_TTL = float(os.getenv("REPORTS_CACHE_TTL", 300))
+
+# Fuso orario per la data corrente usata nel calcolo dell'età (vuoto = fuso locale)
+CLOCK_TZ = os.getenv("CLOCK_TZ") or None
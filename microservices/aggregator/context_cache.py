@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+
+"""
+Cache del contesto paziente dell'aggregator.
+
+Ogni entry scade dopo il proprio TTL e può essere invalidata esplicitamente
+(es. quando report-management notifica la creazione o la modifica di un report).
+Per non salvare dati letti prima di un'invalidazione arrivata durante la
+richiesta, chi legge prende la versione della chiave prima della chiamata a
+valle e la passa a set(): se nel frattempo la chiave è stata invalidata il
+valore viene scartato.
+
+Le invalidazioni sono numerate con un contatore unico e se ne ricordano al
+massimo max_size: quando la più vecchia viene dimenticata, set() scarta anche
+i valori letti prima di essa (al peggio un dato in meno in cache, mai uno vecchio).
+"""
+
+
+class ContextCache:
+    def __init__(self, ttl: float, max_size: int = 10000):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries = {}                 # chiave -> (valore, scadenza)
+        self._invalidated = OrderedDict()  # chiave -> numero dell'ultima invalidazione (dalla più vecchia)
+        self._clock = 0                    # numero dell'ultima invalidazione
+        self._floor = 0                    # invalidazioni dimenticate fino a questo numero
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def version(self, key) -> int:
+        return self._clock
+
+    def set(self, key, value, version: int):
+        if version < self._floor or self._invalidated.get(key, 0) > version:
+            # chiave invalidata dopo la lettura (o non più verificabile): il valore può essere vecchio
+            return
+        if len(self._entries) >= self._max_size and key not in self._entries:
+            # cache piena: si scarta l'entry inserita per prima
+            del self._entries[next(iter(self._entries))]
+        self._entries[key] = (value, time.monotonic() + self._ttl)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+        self._clock += 1
+        self._invalidated[key] = self._clock
+        self._invalidated.move_to_end(key)
+        if len(self._invalidated) > self._max_size:
+            _, forgotten = self._invalidated.popitem(last=False)
+            self._floor = forgotten
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "ttl": self._ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -1,15 +1,26 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
 import httpx
+from fastapi import FastAPI, HTTPException
 from contextlib import asynccontextmanager
-from config import AUTH_SERVICE_URL, REPORT_SERVICE_URL, ROUTE_AUTH_SERVICE, ROUTE_REPORT_SERVICE
-from datetime import date, datetime
+from config import AUTH_SERVICE_URL, REPORT_SERVICE_URL, ROUTE_AUTH_SERVICE, AUTH_CLIENT_SETTINGS, REPORT_CLIENT_SETTINGS
+from config import ROUTE_REPORT_CONTEXT, REPORT_HISTORY_LIMIT, REPORT_HISTORY_SUMMARY
+from config import AUTH_DEADLINE, REPORT_DEADLINE, PROFILE_CACHE_TTL, REPORTS_CACHE_TTL, CLOCK_TZ
+from http_client import create_client, pool_metrics
+from context_cache import ContextCache
+from clock import SystemClock
+from patient_context import Demographics, PatientContext
+from pydantic import BaseModel
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.client = httpx.AsyncClient(timeout=20.0)
-    app.state.today = date.today()
+    app.state.auth_client = create_client("auth", AUTH_CLIENT_SETTINGS)
+    app.state.report_client = create_client("report", REPORT_CLIENT_SETTINGS)
+    app.state.clock = SystemClock(CLOCK_TZ)
+    app.state.profile_cache = ContextCache(ttl=PROFILE_CACHE_TTL)
+    app.state.reports_cache = ContextCache(ttl=REPORTS_CACHE_TTL)
     yield  # to be executed at shutdown
-    await app.state.client.aclose()
+    await app.state.auth_client.aclose()
+    await app.state.report_client.aclose()
 
 
 app = FastAPI(title="Aggregator service", lifespan=lifespan)
@@ -19,47 +30,102 @@ app = FastAPI(title="Aggregator service", lifespan=lifespan)
 async def health_check():
     return {"status": "T'appost Aggregator running!"}
 
-@app.get("/aggregator/{patient_id}")
-async def get_patient_context(patient_id: int):
-    auth_resp = await app.state.client.get(f"{AUTH_SERVICE_URL}{ROUTE_AUTH_SERVICE}/{patient_id}")
-    report_resp = await app.state.client.get(f"{REPORT_SERVICE_URL}{ROUTE_REPORT_SERVICE}/{patient_id}")
-    
-    if auth_resp.status_code != 200 or report_resp.status_code != 200:
-        raise HTTPException(status_code=500, detail="Failed to fetch data")
-    
-    auth_data = auth_resp.json()
-     # 🔹 Converti la data ISO in datetime.date
-    
-    # 🔹 Converte la stringa ISO in datetime.date
-    birth_date = datetime.fromisoformat(auth_data['birth_date']).date()
-
-    age = app.state.today.year - birth_date.year - (
-        (app.state.today.month, app.state.today.day) < (birth_date.month, birth_date.day)
-        )
-    
-    print("Age:", age)
-
-    report_data = report_resp.json()
-
-    print(report_data)
-    # 🔹 Estrazione campi dai report
-    reports_list = [
-        {
-            "data": r["date"],
-            "motivazione": r["motivazione"],
-            "diagnosi": r["diagnosi"],
-            "sintomi": r["sintomi"],
-            "trattamento": r["trattamento"]
-        }
-        for r in report_data
-    ]
-
-    # 🔹 Risposta aggregata
+@app.get("/metrics")
+async def metrics():
     return {
-        "patient_id": patient_id,
-        "social_sec_number": auth_data['social_sec_number'],
-        "age": age,
-        "sex": auth_data["sex"],
-        "reports": reports_list
+        "profile_cache": app.state.profile_cache.stats(),
+        "reports_cache": app.state.reports_cache.stats(),
+        "pool_wait": pool_metrics.stats(),
     }
-    
+
+async def fetch_json(client, url: str, deadline: float, params: dict = None):
+    """GET con tempo massimo complessivo; solleva un'eccezione se fallisce o va oltre la deadline."""
+    resp = await asyncio.wait_for(client.get(url, params=params), timeout=deadline)
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def cached_fetch(cache: ContextCache, patient_id: int, client, url: str, deadline: float,
+                       params: dict = None, parse=None):
+    """
+    Come fetch_json, ma usa la cache se il dato è presente; le risposte fallite non vengono salvate.
+    Se indicato, parse converte la risposta prima di salvarla (la conversione avviene una volta sola).
+    """
+    data = cache.get(patient_id)
+    if data is not None:
+        return data
+    version = cache.version(patient_id)
+    data = await fetch_json(client, url, deadline, params)
+    if parse is not None:
+        data = parse(data)
+    cache.set(patient_id, data, version)
+    return data
+
+
+class ContextEvent(BaseModel):
+    event: str          # es. "report.created", "report.updated", "profile.updated"
+    patient_id: int
+
+
+@app.post("/aggregator/events")
+async def context_event(data: ContextEvent):
+    """
+    Webhook chiamato dagli altri servizi quando cambiano i dati di un paziente:
+    invalida la parte di contesto corrispondente.
+    """
+    if data.event.startswith("report."):
+        app.state.reports_cache.invalidate(data.patient_id)
+    elif data.event.startswith("profile."):
+        app.state.profile_cache.invalidate(data.patient_id)
+    else:
+        raise HTTPException(status_code=400, detail=f"Evento sconosciuto: {data.event}")
+    print(f"Contesto del paziente {data.patient_id} invalidato ({data.event})")
+    return {"invalidated": True}
+
+
+@app.get("/aggregator/{patient_id}", response_model=PatientContext)
+async def get_patient_context(patient_id: int):
+    # le due chiamate sono indipendenti: partono insieme e la latenza è quella della più lenta;
+    # per i pazienti già visti profilo e report arrivano dalla cache senza chiamate a valle
+    auth_result, report_result = await asyncio.gather(
+        cached_fetch(app.state.profile_cache, patient_id, app.state.auth_client,
+                     f"{AUTH_SERVICE_URL}{ROUTE_AUTH_SERVICE}/{patient_id}", AUTH_DEADLINE,
+                     parse=Demographics.model_validate),
+        cached_fetch(app.state.reports_cache, patient_id, app.state.report_client,
+                     f"{REPORT_SERVICE_URL}{ROUTE_REPORT_CONTEXT}/{patient_id}", REPORT_DEADLINE,
+                     params={"limit": REPORT_HISTORY_LIMIT, "summary": str(REPORT_HISTORY_SUMMARY).lower()}),
+        return_exceptions=True,
+    )
+
+    missing = []
+    for name, result in (("auth", auth_result), ("report", report_result)):
+        if isinstance(result, httpx.HTTPStatusError) and 400 <= result.response.status_code < 500:
+            # risposta valida del servizio (es. 404 paziente inesistente): non è un guasto
+            # da aggirare con un contesto parziale, l'errore va restituito al chiamante
+            print(f"Chiamata a {name} rifiutata per il paziente {patient_id}: {result.response.status_code}")
+            try:
+                detail = result.response.json().get("detail", result.response.text)
+            except ValueError:
+                detail = result.response.text
+            raise HTTPException(status_code=result.response.status_code, detail=detail)
+
+    for name, result in (("auth", auth_result), ("report", report_result)):
+        # solo timeout, errori di connessione e 5xx rendono il contesto parziale
+        if isinstance(result, BaseException):
+            reason = "timeout" if isinstance(result, asyncio.TimeoutError) else repr(result)
+            print(f"Chiamata a {name} fallita per il paziente {patient_id}: {reason}")
+            missing.append(name)
+
+    if len(missing) == 2:
+        raise HTTPException(status_code=502, detail="Failed to fetch data")
+
+    # 🔹 Contesto aggregato: età e fascia d'età calcolate sulla data di oggi (anche per i profili in cache)
+    context = PatientContext.build(
+        patient_id,
+        demographics=auth_result if "auth" not in missing else None,
+        report_context=report_result if "report" not in missing else None,
+        today=app.state.clock.today(),
+        missing=missing,
+    )
+    print("Age:", context.age, context.age_bracket)
+    return context
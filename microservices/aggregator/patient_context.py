@@ -0,0 +1,83 @@
+from datetime import date
+from typing import List, Optional
+from pydantic import BaseModel
+
+"""
+Contesto clinico del paziente scambiato tra aggregator e decision engine.
+
+L'aggregator lo costruisce (età e fascia d'età calcolate una sola volta per
+richiesta), il decision engine lo legge con lo stesso modello.
+Il file è identico nei due servizi: va modificato in entrambi.
+"""
+
+
+# (età minima, fascia) in ordine crescente
+AGE_BRACKETS = (
+    (0, "pediatrico"),
+    (14, "adolescente"),
+    (18, "adulto"),
+    (65, "anziano"),
+    (80, "grande anziano"),
+)
+
+
+def age_on(birth_date: date, today: date) -> int:
+    return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+
+def age_bracket(age: int) -> str:
+    bracket = AGE_BRACKETS[0][1]
+    for min_age, name in AGE_BRACKETS:
+        if age >= min_age:
+            bracket = name
+    return bracket
+
+
+class Demographics(BaseModel):
+    """Dati anagrafici del profilo auth, con la data di nascita già convertita in date."""
+    social_sec_number: str
+    sex: str
+    birth_date: date
+
+
+class ContextReport(BaseModel):
+    data: str
+    motivazione: Optional[str] = None
+    diagnosi: Optional[str] = None
+    sintomi: Optional[str] = None
+    trattamento: Optional[str] = None
+
+
+class OlderReports(BaseModel):
+    count: int
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+    diagnosi: List[str] = []
+
+
+class PatientContext(BaseModel):
+    patient_id: int
+    social_sec_number: Optional[str] = None
+    age: Optional[int] = None
+    age_bracket: Optional[str] = None
+    sex: Optional[str] = None
+    reports: List[ContextReport] = []
+    older_reports: Optional[OlderReports] = None
+    degraded: bool = False
+    missing: List[str] = []
+
+    @classmethod
+    def build(cls, patient_id: int, demographics: Optional[Demographics], report_context: Optional[dict],
+              today: date, missing: List[str]) -> "PatientContext":
+        context = cls(patient_id=patient_id, degraded=bool(missing), missing=missing)
+        if demographics is not None:
+            context.social_sec_number = demographics.social_sec_number
+            context.sex = demographics.sex
+            context.age = age_on(demographics.birth_date, today)
+            context.age_bracket = age_bracket(context.age)
+        if report_context is not None:
+            context.reports = [ContextReport(data=r["date"], **{k: v for k, v in r.items() if k != "date"})
+                               for r in report_context["reports"]]
+            if report_context.get("older"):
+                context.older_reports = OlderReports(**report_context["older"])
+        return context
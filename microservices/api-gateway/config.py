@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+from http_client import settings_from_env
 
 # Carica il file .env
 load_dotenv()
@@ -8,9 +9,29 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", 60))
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", 1024))         # numero massimo di token in cache
+JWT_CACHE_MAX_TTL = float(os.getenv("JWT_CACHE_MAX_TTL", 300))  # secondi massimi di permanenza in cache
+
+# Per ogni microservizio: URL e impostazioni del client httpx (pool, keep-alive, HTTP/2, timeout),
+# configurabili con le variabili MICROSERVICE_<NOME>_* (es. MICROSERVICE_INGEST_READ_TIMEOUT)
 MICROSERVICES = {
-    "auth": os.getenv("MICROSERVICE_AUTH"),
-    "ingest": os.getenv("MICROSERVICE_INGEST"),
-    "decision": os.getenv("MICROSERVICE_DECISION"),
-    "report": os.getenv("MICROSERVICE_REPORT"),
-}
\ No newline at end of file
+    "auth": {
+        "url": os.getenv("MICROSERVICE_AUTH"),
+        "client": settings_from_env("MICROSERVICE_AUTH"),
+    },
+    "ingest": {
+        "url": os.getenv("MICROSERVICE_INGEST"),
+        "client": settings_from_env("MICROSERVICE_INGEST"),
+    },
+    "decision": {
+        "url": os.getenv("MICROSERVICE_DECISION"),
+        "client": settings_from_env("MICROSERVICE_DECISION"),
+    },
+    "report": {
+        "url": os.getenv("MICROSERVICE_REPORT"),
+        "client": settings_from_env("MICROSERVICE_REPORT"),
+    },
+}
+
+# File YAML opzionale con la tabella delle rotte (se assente si usa quella in routes.py)
+ROUTES_FILE = os.getenv("ROUTES_FILE")
@@ -0,0 +1,122 @@
+from dataclasses import dataclass
+import os
+import time
+import httpx
+
+"""
+Factory dei client httpx usati per parlare con gli altri microservizi.
+
+Ogni microservizio a valle ha il suo client, con pool di connessioni, keep-alive,
+HTTP/2 e timeout (connect/read/write/pool) configurabili separatamente.
+Le impostazioni si leggono dalle variabili d'ambiente con un prefisso, ad esempio
+per il prefisso AUTH:
+
+    AUTH_MAX_CONNECTIONS, AUTH_MAX_KEEPALIVE_CONNECTIONS, AUTH_KEEPALIVE_EXPIRY,
+    AUTH_HTTP2, AUTH_CONNECT_TIMEOUT, AUTH_READ_TIMEOUT, AUTH_WRITE_TIMEOUT, AUTH_POOL_TIMEOUT
+
+Per ogni richiesta viene misurato il tempo di attesa di una connessione libera
+nel pool (pool wait), esposto da pool_metrics.
+"""
+
+
+@dataclass(frozen=True)
+class ClientSettings:
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+    connect_timeout: float = 5.0
+    read_timeout: float = 20.0
+    write_timeout: float = 20.0
+    pool_timeout: float = 5.0
+
+
+def settings_from_env(prefix: str, **defaults) -> ClientSettings:
+    """
+    Costruisce le impostazioni di un client leggendo le variabili <PREFIX>_*;
+    i valori non presenti nell'ambiente prendono i default passati o quelli di ClientSettings.
+    """
+    base = ClientSettings(**defaults)
+
+    def env(name, cast, current):
+        value = os.getenv(f"{prefix}_{name}")
+        return current if value is None else cast(value)
+
+    return ClientSettings(
+        max_connections=env("MAX_CONNECTIONS", int, base.max_connections),
+        max_keepalive_connections=env("MAX_KEEPALIVE_CONNECTIONS", int, base.max_keepalive_connections),
+        keepalive_expiry=env("KEEPALIVE_EXPIRY", float, base.keepalive_expiry),
+        http2=env("HTTP2", lambda v: v.lower() in ("1", "true", "yes"), base.http2),
+        connect_timeout=env("CONNECT_TIMEOUT", float, base.connect_timeout),
+        read_timeout=env("READ_TIMEOUT", float, base.read_timeout),
+        write_timeout=env("WRITE_TIMEOUT", float, base.write_timeout),
+        pool_timeout=env("POOL_TIMEOUT", float, base.pool_timeout),
+    )
+
+
+# eventi di httpcore che indicano che la richiesta ha ottenuto una connessione dal pool:
+# apertura di una nuova connessione oppure invio degli header su una connessione riusata
+CONNECTION_ACQUIRED_EVENTS = {
+    "connection.connect_tcp.started",
+    "http11.send_request_headers.started",
+    "http2.send_request_headers.started",
+}
+
+
+class PoolWaitMetrics:
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, upstream: str, seconds: float):
+        stats = self._stats.setdefault(upstream, {"requests": 0, "total_wait": 0.0, "max_wait": 0.0})
+        stats["requests"] += 1
+        stats["total_wait"] += seconds
+        stats["max_wait"] = max(stats["max_wait"], seconds)
+
+    def stats(self) -> dict:
+        return {
+            upstream: {
+                "requests": s["requests"],
+                "avg_wait_ms": round(1000 * s["total_wait"] / s["requests"], 3) if s["requests"] else 0.0,
+                "max_wait_ms": round(1000 * s["max_wait"], 3),
+            }
+            for upstream, s in self._stats.items()
+        }
+
+
+pool_metrics = PoolWaitMetrics()
+
+
+def create_client(upstream: str, settings: ClientSettings, **kwargs) -> httpx.AsyncClient:
+    """
+    Crea il client httpx verso un microservizio con le impostazioni indicate.
+    """
+
+    async def attach_pool_trace(request: httpx.Request):
+        started = time.perf_counter()
+        acquired = False
+
+        async def trace(event_name, info):
+            nonlocal acquired
+            if not acquired and event_name in CONNECTION_ACQUIRED_EVENTS:
+                acquired = True
+                pool_metrics.record(upstream, time.perf_counter() - started)
+
+        request.extensions["trace"] = trace
+
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.max_connections,
+            max_keepalive_connections=settings.max_keepalive_connections,
+            keepalive_expiry=settings.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.connect_timeout,
+            read=settings.read_timeout,
+            write=settings.write_timeout,
+            pool=settings.pool_timeout,
+        ),
+        http2=settings.http2,
+        event_hooks={"request": [attach_pool_trace]},
+        **kwargs,
+    )
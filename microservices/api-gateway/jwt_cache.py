@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+import jwt
+
+"""
+Cache LRU dei claim dei JWT già verificati.
+
+Il frontend invia lo stesso bearer token per tutta la sessione: la verifica
+HMAC completa viene fatta solo la prima volta, le richieste successive con lo
+stesso token recuperano i claim dalla cache finché il token non scade.
+I token non validi non vengono mai messi in cache, quindi vengono sempre
+rifiutati da jwt.decode.
+
+Il secret viene letto solo all'avvio (SECRET_KEY): per ruotarlo si riavvia il
+gateway, e con il processo si svuota anche questa cache. Una entry resta comunque
+valida al massimo max_ttl secondi (JWT_CACHE_MAX_TTL) o fino all'exp del token.
+"""
+
+
+class ClaimsCache:
+    def __init__(self, secret: str, algorithm: str, max_size: int = 1024, max_ttl: float = 300.0):
+        self._secret = secret
+        self._algorithm = algorithm
+        self._max_size = max_size
+        self._max_ttl = max_ttl            # durata massima di una entry, anche per token senza "exp"
+        self._entries = OrderedDict()      # digest del token -> (claims, scadenza entry)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _digest(token: str) -> str:
+        # in cache non teniamo il token in chiaro ma solo il suo hash
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def decode(self, token: str) -> dict:
+        """
+        Restituisce i claim del token, verificandone firma e scadenza solo se
+        non è già in cache. Solleva le stesse eccezioni di jwt.decode.
+        """
+        key = self._digest(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return claims
+                # token scaduto: lo togliamo e lasciamo che sia jwt.decode a rifiutarlo
+                del self._entries[key]
+            self.misses += 1
+
+        claims = jwt.decode(token, self._secret, algorithms=[self._algorithm])
+
+        expires_at = now + self._max_ttl
+        if claims.get("exp") is not None:
+            expires_at = min(expires_at, float(claims["exp"]))
+
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+        return claims
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -4,11 +4,20 @@
 # Invoke-RestMethod -Uri "http://localhost:8000/signup/operator" -Method POST -Headers @{ "Content-Type" = "application/json" } -Body '{"med_register_code":"MED123456","firstname":"Giulia","lastname":"Rossi","email":"giulia.rossi@example.com","phone_number":"+393331112233","password":"SecurePass!2025"}'
 
 
-from fastapi import FastAPI, Request, HTTPException, Response
+from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.requests import HTTPConnection
 from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+import asyncio
 import httpx  
 import jwt 
-from config import SECRET_KEY, JWT_ALGORITHM, MICROSERVICES
+import websockets
+from config import SECRET_KEY, JWT_ALGORITHM, JWT_CACHE_SIZE, JWT_CACHE_MAX_TTL, MICROSERVICES, ROUTES_FILE
+from jwt_cache import ClaimsCache
+from http_client import create_client, pool_metrics
+from routes import CompiledRoute, compile_routes, load_routes
 
 """
 httpx è una libreria Python che ti permette di fare richieste 
@@ -19,19 +28,33 @@ in modo semplice, un po' come requests, ma con alcune differenze:
 
 """
 
-# creiamo un client httpx.AsyncClient allo startup 
+# creiamo allo startup un client httpx.AsyncClient per ogni microservizio,
+# ognuno con il proprio pool di connessioni configurato in MICROSERVICES
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.client = httpx.AsyncClient(timeout=20.0)
+    app.state.clients = {
+        name: create_client(name, service["client"]) for name, service in MICROSERVICES.items()
+    }
     yield  # to be executed at shutdown
-    await app.state.client.aclose()
+    for client in app.state.clients.values():
+        await client.aclose()
  
 app = FastAPI(title="API Gateway", lifespan=lifespan)
 
 
+# Header "hop-by-hop": riguardano la singola connessione e non vanno inoltrati
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade",
+}
+
+
+# claim dei token già verificati, condivisi tra tutte le richieste
+claims_cache = ClaimsCache(SECRET_KEY, JWT_ALGORITHM, max_size=JWT_CACHE_SIZE, max_ttl=JWT_CACHE_MAX_TTL)
+
 
 # --- verifica token e controllo ruolo generico ---
-async def verify_jwt_with_role(request: Request, required_role: str):
+async def verify_jwt_with_role(request: HTTPConnection, required_role: str):
     """
     Verifica firma e scadenza del token e controlla che l'utente
     abbia il ruolo richiesto.
@@ -39,13 +62,17 @@ async def verify_jwt_with_role(request: Request, required_role: str):
     print(request.headers)
 
     auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
+    if auth_header and auth_header.startswith("Bearer "):
+        token = auth_header.split(" ")[1]
+    elif request.scope["type"] == "websocket" and request.query_params.get("token"):
+        # i browser non permettono header personalizzati sui WebSocket: il token arriva in query string
+        token = request.query_params["token"]
+    else:
         raise HTTPException(status_code=401, detail="Token mancante")
 
-    token = auth_header.split(" ")[1]
-
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        # la firma viene verificata solo la prima volta che il token viene visto
+        payload = claims_cache.decode(token)
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token scaduto")
     except jwt.InvalidTokenError:
@@ -63,21 +90,27 @@ async def verify_jwt_with_role(request: Request, required_role: str):
     return 
 
 
-# Funzione di proxy verso i microservizi
-async def proxy_request(request: Request, method: str, service_url: str, role: str = None):
-    
-    target_path = request.url.path
-    
-    if not target_path.startswith(("/login","/signup")):
-        # await verify_jwt(request)
-        await verify_jwt_with_role(request, role)
+def internal_user_headers(request: HTTPConnection) -> dict:
+    # Strategia microservizi si fidano del controllo gateway sul token
+    return {
+        "X-User-Id": str(request.state.user["user_id"]),
+        "X-User-Role": str(request.state.user.get("role", "user")),
+        "X-User-Expiry": str(request.state.user.get("expiry", "")),
+    }
 
-    if target_path.startswith("/diagnose"): # da vedere se ci piace
-        target_path = "/ingestion"   # localhost:8000/diagnose ->> localhost:8002/ingestion
 
-    # localhost:8000/ingestion ->>   localhost:8002/ingestion
+# Funzione di proxy verso i microservizi
+async def proxy_request(request: Request, route: CompiledRoute):
+    
+    if not route.public:
+        await verify_jwt_with_role(request, route.role)
 
-    url = f"{service_url}{target_path}"  # concateniamo con l'url del microservizio es. /localhost:8001
+    # l'URL di destinazione è già calcolato nella tabella delle rotte,
+    # qui vanno solo sostituiti gli eventuali parametri del path
+    url = route.target_url(request.path_params)
+    # la query string viene inoltrata così com'è (es. paginazione e filtri di /reports)
+    if request.url.query:
+        url = f"{url}?{request.url.query}"
 
     print(url)
   
@@ -85,135 +118,156 @@ async def proxy_request(request: Request, method: str, service_url: str, role: s
     """
     Esempio: 
     # Richiesta originale al gateway:
-    GET http://localhost:8000/users/42/profile
+    GET http://localhost:8000/reports/id/42
 
-    # service_url (microservizio utenti):
-    service_url = "http://localhost:8001"
+    # target della rotta (microservizio report):
+    route.target = "http://localhost:8004/reports/id/{patient_id}"
 
     # Risultato finale:
-    url = "http://localhost:8001/users/42/profile"
+    url = "http://localhost:8004/reports/id/42"
 
     """
 
     # è inutile ricavare il body se ho una get o head
-    if method in ["post", "put", "patch", "delete"]:
-        body = await request.body()
+    # il body non viene letto in memoria: request.stream() lo inoltra a blocchi
+    # al microservizio man mano che arriva dal client (es. upload audio su /diagnose)
+    if route.method in ["post", "put", "patch", "delete"]:
+        body = request.stream()
     else: 
         body = None
 
-    headers = dict(request.headers)
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
 
     # Se l’utente è autenticato, aggiungo info interne - Strategia microservizi si fidano del controllo gateway sul token 
     if hasattr(request.state, "user"):
-        headers["X-User-Id"] = str(request.state.user["user_id"])
-        headers["X-User-Role"] = str(request.state.user.get("role", "user"))
-        headers["X-User-Expiry"] = str(request.state.user.get("expiry", ""))
+        headers.update(internal_user_headers(request))
         headers.pop("Authorization", None)  # il microservizio non ha bisogno del token
 
-    # Richiesta al microservizio
+    # Richiesta al microservizio in modalità stream: la risposta non viene
+    # bufferizzata nel gateway ma girata al client blocco per blocco (es. PDF dei report)
+    client = app.state.clients[route.service]
+    upstream_request = client.build_request(route.method, url, content=body, headers=headers, timeout=route.timeout)
     try:
-        response = await app.state.client.request(method, url, content=body, headers=headers)
+        response = await client.send(upstream_request, stream=True)
+    except httpx.PoolTimeout:
+        # tutte le connessioni verso il microservizio sono occupate
+        raise HTTPException(status_code=503, detail="Servizio momentaneamente sovraccarico")
     except httpx.ReadTimeout:
         raise HTTPException(status_code=504, detail="Timeout durante la comunicazione")
 
- 
-    return Response(content=response.content, status_code=response.status_code, headers=response.headers)
+    response_headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS}
+
+    # aiter_raw inoltra i byte così come arrivano (eventuale content-encoding incluso),
+    # la connessione verso il microservizio viene chiusa a trasferimento terminato
+    return StreamingResponse(
+        response.aiter_raw(),
+        status_code=response.status_code,
+        headers=response_headers,
+        background=BackgroundTask(response.aclose),
+    )
  
 
+# Proxy WebSocket verso i microservizi (es. trascrizione in streaming su /diagnose/ws):
+# a differenza del proxy HTTP i messaggi viaggiano nei due sensi contemporaneamente
+async def proxy_websocket(websocket: WebSocket, route: CompiledRoute):
+    try:
+        if not route.public:
+            await verify_jwt_with_role(websocket, route.role)
+    except HTTPException as e:
+        # 1008 = policy violation: la connessione viene rifiutata prima dell'handshake
+        await websocket.close(code=1008, reason=str(e.detail))
+        return
+
+    url = route.target_url(websocket.path_params)
+    query = [(k, v) for k, v in websocket.query_params.multi_items() if k != "token"]
+    if query:
+        url = f"{url}?{urlencode(query)}"
+
+    headers = internal_user_headers(websocket) if hasattr(websocket.state, "user") else {}
+    try:
+        upstream = await websockets.connect(url, additional_headers=headers, max_size=None)
+    except (OSError, asyncio.TimeoutError, websockets.InvalidHandshake) as e:
+        print(f"WebSocket verso {url} non riuscito: {e}")
+        await websocket.close(code=1011, reason="Servizio non raggiungibile")
+        return
+
+    await websocket.accept()
+
+    async def client_to_upstream():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    await upstream.send(message["bytes"])
+                elif message.get("text") is not None:
+                    await upstream.send(message["text"])
+        finally:
+            await upstream.close()
+
+    async def upstream_to_client():
+        async for message in upstream:
+            if isinstance(message, bytes):
+                await websocket.send_bytes(message)
+            else:
+                await websocket.send_text(message)
+        # 1005/1006 (chiusura senza codice o anomala) non si possono inviare al client
+        code = upstream.close_code
+        await websocket.close(code=1011 if code == 1006 else 1000 if code in (None, 1005) else code)
+
+    # appena uno dei due lati chiude si interrompe anche l'altro
+    tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+    done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    for task in done:
+        if not task.cancelled() and task.exception() is not None and not isinstance(
+            task.exception(), (WebSocketDisconnect, websockets.ConnectionClosed)
+        ):
+            print(f"Errore nel proxy WebSocket {route.path}: {task.exception()!r}")
+    await upstream.close()
+
+
 # Health check endpoint to verify if gateway is properly running
 @app.get("/")
 def health_check():
     return{"status": "API Gateway running"}
 
 
-### Auth service routes 
-
-# Registrazione
-@app.post("/signup/operator") 
-async def signup_proxy(request: Request):
-    return await proxy_request(request, "post", MICROSERVICES["auth"])
-
-# Registrazione
-@app.post("/signup/patient") 
-async def signup_proxy(request: Request):
-    return await proxy_request(request, "post", MICROSERVICES["auth"])
-
-# Login 
-@app.post("/login/patient")
-async def signup_proxy(request: Request):
-    return await proxy_request(request, "post", MICROSERVICES["auth"])
-
-
-# Login 
-@app.post("/login/operator")
-async def signup_proxy(request: Request):
-    return await proxy_request(request, "post", MICROSERVICES["auth"])
-
-
-# Get User data
+# Metriche interne del gateway
+@app.get("/metrics")
+def metrics():
+    return {"jwt_cache": claims_cache.stats(), "pool_wait": pool_metrics.stats()}
 
-@app.get("/user/profile/{patient_id}")
-async def user_proxy(request: Request):
-    return await proxy_request(request, "post", MICROSERVICES['auth'])
 
+### Rotte verso i microservizi
+# caricate una sola volta all'avvio dalla tabella in routes.py (o da ROUTES_FILE)
 
+def make_proxy_handler(route: CompiledRoute):
+    async def handler(request: Request):
+        return await proxy_request(request, route)
+    return handler
 
 
-"""  Uniti in un'unica rotta
-## Ingestion service route
-@app.post("/ingestion")
-async def ingestion_proxy(request: Request):
-    # Richiede ruolo operator (es. medico che invia audio)
-    return await proxy_request(request, "post", MICROSERVICES["ingest"], "patient")
-
-
-## Decision engine service route
-@app.get("/llm")
-async def signup_proxy(request: Request):
-    return await proxy_request(request, "get", MICROSERVICES["decision"], "patient")
-
-@app.post("/llm/diagnose")
-async def signup_proxy(request: Request):
-    return await proxy_request(request, "post", MICROSERVICES["decision"], "patient")
-
-"""
-
-
-
-@app.post("/diagnose")  # ingest richiamerà decision
-async def diagnose_proxy(request: Request):
-    return await proxy_request(request, "post", MICROSERVICES["ingest"], "patient")
-
-
-
-## report 
-
-
-## ROUTE PER RICAVARE I REPORT DI UN PAZIENTE
-
-@app.get("/reports")
-async def find_reports_proxy(request: Request):
-    return await proxy_request(request, "get", MICROSERVICES["report"], "operator")
-
-@app.get("/reports/id/{patient_id}")
-async def find_reports_by_id_proxy(request: Request):
-    return await proxy_request(request, "get", MICROSERVICES["report"], "patient")
-
-
-@app.get("/reports/ssn/{social_sec_number}")
-async def find_reports_by_ssn_proxy(request: Request):
-    return await proxy_request(request, "get", MICROSERVICES["report"], "operator")
-
-
-## ROUTE PER AGGIORNARE UN SINGOLO REPORT
-@app.put("/report/{report_id}")
-async def update_report_proxy(request: Request):
-    return await proxy_request(request, "put", MICROSERVICES["report"], "operator")
-
-    
-## ROUTE PER GENERARE UN PDF 
-@app.get("/report/pdf/{report_id}")
-async def pdf_report_proxy(request: Request):
-    return await proxy_request(request, "get", MICROSERVICES['report'])
+def make_websocket_handler(route: CompiledRoute):
+    async def handler(websocket: WebSocket):
+        await proxy_websocket(websocket, route)
+    return handler
 
 
+for compiled_route in compile_routes(load_routes(ROUTES_FILE), MICROSERVICES):
+    if compiled_route.method == "websocket":
+        app.add_api_websocket_route(
+            compiled_route.path,
+            make_websocket_handler(compiled_route),
+            name=f"websocket_{compiled_route.path}",
+        )
+        continue
+    app.add_api_route(
+        compiled_route.path,
+        make_proxy_handler(compiled_route),
+        methods=[compiled_route.method.upper()],
+        name=f"{compiled_route.method}_{compiled_route.path}",
+    )
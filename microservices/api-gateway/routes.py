@@ -0,0 +1,135 @@
+from dataclasses import dataclass
+from typing import List, Optional, Union
+import re
+import httpx
+
+"""
+Tabella dichiarativa delle rotte del gateway.
+
+Ogni rotta indica metodo, path esposto dal gateway, microservizio di destinazione,
+ruolo richiesto, eventuale riscrittura del path e timeout dedicato.
+La tabella viene letta una sola volta all'avvio (dal codice oppure da un file YAML
+indicato dalla variabile ROUTES_FILE) e compilata: per ogni rotta si calcolano
+in anticipo URL di destinazione e timeout, così a runtime il proxy non deve
+più fare confronti sul path per capire dove inoltrare la richiesta.
+"""
+
+PATH_PARAM = re.compile(r"{(\w+)}")
+
+
+@dataclass(frozen=True)
+class Route:
+    method: str                     # metodo HTTP (get, post, put, ...) oppure "websocket"
+    path: str                       # path esposto dal gateway, es. /reports/id/{patient_id}
+    service: str                    # chiave del microservizio in MICROSERVICES
+    role: Optional[str] = None      # ruolo richiesto (None = qualsiasi utente autenticato)
+    public: bool = False            # True = nessuna verifica del token (login, signup)
+    rewrite: Optional[str] = None   # path verso il microservizio, se diverso da quello del gateway
+    timeout: Optional[float] = None # timeout di lettura dedicato in secondi (None = quello del client)
+
+
+@dataclass(frozen=True)
+class CompiledRoute:
+    method: str
+    service: str
+    path: str
+    role: Optional[str]
+    public: bool
+    target: str                     # URL completo di destinazione, con eventuali {parametri}
+    has_params: bool
+    timeout: Union[httpx.Timeout, object]  # httpx.USE_CLIENT_DEFAULT se la rotta non ha un timeout dedicato
+
+    def target_url(self, path_params: dict) -> str:
+        if not self.has_params:
+            return self.target
+        return self.target.format(**path_params)
+
+
+DEFAULT_ROUTES = [
+    # Auth service
+    Route("post", "/signup/operator", "auth", public=True),
+    Route("post", "/signup/patient", "auth", public=True),
+    Route("post", "/login/patient", "auth", public=True),
+    Route("post", "/login/operator", "auth", public=True),
+    Route("get", "/user/profile/{patient_id}", "auth"),
+
+    # Ingestion (richiamerà il decision engine)
+    # localhost:8000/diagnose ->> localhost:8002/ingestion
+    Route("post", "/diagnose", "ingest", role="patient", rewrite="/ingestion"),
+    # registrazioni lunghe: audio a blocchi in ingresso, trascrizioni parziali (NDJSON) in uscita.
+    # Il proxy HTTP/1.1 invia tutto il body prima di leggere la risposta, quindi da qui i parziali
+    # arrivano a fine registrazione: per riceverli mentre il paziente parla si usa /diagnose/ws
+    Route("post", "/diagnose/stream", "ingest", role="patient", rewrite="/ingestion/stream", timeout=120),
+    Route("websocket", "/diagnose/ws", "ingest", role="patient", rewrite="/ingestion/ws"),
+
+    # Report management
+    Route("get", "/reports", "report", role="operator"),
+    # export ZIP dei PDF: la risposta arriva in streaming mentre i PDF vengono generati
+    Route("get", "/reports/export", "report", role="operator", timeout=300),
+    Route("get", "/reports/id/{patient_id}", "report", role="patient"),
+    Route("get", "/reports/ssn/{social_sec_number}", "report", role="operator"),
+    Route("put", "/report/{report_id}", "report", role="operator"),
+    Route("get", "/report/pdf/{report_id}", "report"),
+]
+
+
+def load_routes(path: Optional[str] = None) -> List[Route]:
+    """
+    Restituisce la tabella delle rotte: quella di default oppure quella letta
+    dal file YAML, nel formato
+
+        routes:
+          - method: post
+            path: /diagnose
+            service: ingest
+            role: patient
+            rewrite: /ingestion
+            timeout: 60
+    """
+    if not path:
+        return list(DEFAULT_ROUTES)
+
+    import yaml  # serve solo se la tabella è su file
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f) or {}
+
+    return [Route(**entry) for entry in data.get("routes", [])]
+
+
+def compile_routes(routes: List[Route], microservices: dict) -> List[CompiledRoute]:
+    compiled = []
+    for route in routes:
+        if route.service not in microservices:
+            raise ValueError(f"Microservizio sconosciuto '{route.service}' per la rotta {route.path}")
+
+        upstream_path = route.rewrite or route.path
+
+        # il timeout della rotta sostituisce solo quello di lettura,
+        # connect/write/pool restano quelli del client del microservizio
+        timeout = httpx.USE_CLIENT_DEFAULT
+        if route.timeout is not None:
+            settings = microservices[route.service]["client"]
+            timeout = httpx.Timeout(
+                connect=settings.connect_timeout,
+                read=route.timeout,
+                write=settings.write_timeout,
+                pool=settings.pool_timeout,
+            )
+
+        base_url = microservices[route.service]['url']
+        if route.method.lower() == "websocket" and base_url:
+            # stesso host del microservizio, con schema ws:// (o wss://)
+            base_url = re.sub(r"^http", "ws", base_url)
+
+        compiled.append(CompiledRoute(
+            method=route.method.lower(),
+            service=route.service,
+            path=route.path,
+            role=route.role,
+            public=route.public,
+            target=f"{base_url}{upstream_path}",
+            has_params=bool(PATH_PARAM.search(upstream_path)),
+            timeout=timeout,
+        ))
+    return compiled
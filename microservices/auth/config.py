@@ -8,4 +8,7 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MINUTES", 60))
-DATABASE_URL = os.getenv("DATABASE_URL")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Numero massimo di pazienti (id + codici fiscali) in una richiesta a /user/profiles
+PROFILE_BATCH_MAX = int(os.getenv("PROFILE_BATCH_MAX", 1000))
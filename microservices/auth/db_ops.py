@@ -1,6 +1,6 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import select
+from sqlalchemy import select, or_
 from sqlalchemy.exc import IntegrityError
 from schemas import Base, Patient, Operator
 from validation import *
@@ -109,6 +109,27 @@ async def find_patient_by_id(id: int, db: AsyncSession):
 
     return patient
 
+async def find_patients_by_ids(ids: list, social_sec_numbers: list, db: AsyncSession):
+    """
+    Profili di più pazienti (per id e/o codice fiscale) con una sola query WHERE ... IN (...).
+    Vengono letti solo i campi anagrafici, senza la password.
+    """
+    conditions = []
+    if ids:
+        conditions.append(Patient.id.in_(ids))
+    if social_sec_numbers:
+        conditions.append(Patient.social_sec_number.in_(social_sec_numbers))
+    if not conditions:
+        return []
+
+    result = await db.execute(
+        select(
+            Patient.id, Patient.social_sec_number, Patient.firstname, Patient.lastname,
+            Patient.birth_date, Patient.sex, Patient.birth_place,
+        ).where(or_(*conditions))
+    )
+    return result.all()
+
 async def find_operator_by_med_code(data: OperatorLoginRequest, db: AsyncSession):
     result = await db.execute(
         select(Operator).where(Operator.med_register_code == data.med_register_code)
@@ -6,6 +6,7 @@ from validation import *
 from db_ops import *
 from security import *
 from contextlib import asynccontextmanager
+from config import PROFILE_BATCH_MAX
 
 
 @asynccontextmanager
@@ -105,6 +106,18 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+def profile_dict(patient) -> dict:
+    return {
+        "patient_id": patient.id,
+        "social_sec_number": patient.social_sec_number,
+        "firstname": patient.firstname,
+        "lastname": patient.lastname,
+        "birth_date": patient.birth_date.isoformat(),  # converto la data in stringa ISO
+        "sex": patient.sex,
+        "birth_place": patient.birth_place
+    }
+
+
 @app.get("/user/profile/{patient_id}")
 async def get_user_profile(patient_id:int, db: AsyncSession = Depends(get_db)):
     """
@@ -113,12 +126,33 @@ async def get_user_profile(patient_id:int, db: AsyncSession = Depends(get_db)):
 
     patient = await find_patient_by_id(patient_id, db)
 
+    return profile_dict(patient)
+
+
+@app.post("/user/profiles")
+async def get_user_profiles(data: ProfileBatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Profili di più pazienti in una sola chiamata (e una sola query), per id e/o codice fiscale.
+    Risponde con la mappa patient_id -> profilo e con gli id / codici fiscali non trovati.
+    """
+    ids = list(dict.fromkeys(data.ids))
+    social_sec_numbers = list(dict.fromkeys(data.social_sec_numbers))
+    if not ids and not social_sec_numbers:
+        raise HTTPException(status_code=400, detail="Indicare almeno un id o un codice fiscale")
+    if len(ids) + len(social_sec_numbers) > PROFILE_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Al massimo {PROFILE_BATCH_MAX} pazienti per richiesta"
+        )
+
+    patients = await find_patients_by_ids(ids, social_sec_numbers, db)
+    profiles = {str(p.id): profile_dict(p) for p in patients}
+    found_ssn = {p.social_sec_number for p in patients}
+
     return {
-        "patient_id": patient.id,
-        "social_sec_number": patient.social_sec_number,
-        "firstname": patient.firstname,
-        "lastname": patient.lastname,
-        "birth_date": patient.birth_date.isoformat(),  # converto la data in stringa ISO
-        "sex": patient.sex,
-        "birth_place": patient.birth_place
+        "profiles": profiles,
+        "missing": {
+            "ids": [i for i in ids if str(i) not in profiles],
+            "social_sec_numbers": [s for s in social_sec_numbers if s not in found_ssn],
+        },
     }
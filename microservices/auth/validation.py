@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator
 from datetime import date
-from typing import Optional
+from typing import List, Optional
 from typing_extensions import Annotated
 import re
 
@@ -9,6 +9,11 @@ class OperatorRequest(BaseModel):
     patient_id: str
 
 
+class ProfileBatchRequest(BaseModel):
+    ids: List[int] = []
+    social_sec_numbers: List[str] = []
+
+
 
 class PatientSignupRequest(BaseModel):
     firstname: Annotated[str, Field(min_length=2, max_length=30)]
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+from http_client import settings_from_env
 
 # Carica il file .env
 load_dotenv()
@@ -11,4 +12,11 @@ AGGREGATOR_ROUTE = os.getenv("AGGREGATOR_ROUTE")
 CHROMA_HOST = os.getenv("CHROMA_HOST")
 CHROMA_PORT = os.getenv("CHROMA_PORT")
 REPORT_SERVICE_URL = os.getenv("REPORT_SERVICE_URL")
-REPORT_ROUTE = os.getenv("REPORT_ROUTE")
\ No newline at end of file
+REPORT_ROUTE = os.getenv("REPORT_ROUTE")
+
+# Impostazioni dei client httpx verso aggregator e report (variabili AGGREGATOR_SERVICE_* e REPORT_SERVICE_*)
+AGGREGATOR_CLIENT_SETTINGS = settings_from_env("AGGREGATOR_SERVICE")
+REPORT_CLIENT_SETTINGS = settings_from_env("REPORT_SERVICE")
+
+# Numero massimo di chiamate all'LLM in corso contemporaneamente
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
@@ -1,6 +1,5 @@
 from datetime import datetime
 from fastapi import FastAPI, HTTPException, Request
-import httpx
 from pydantic import BaseModel
 from contextlib import asynccontextmanager
 from typing import Dict
@@ -8,6 +7,8 @@ from model import load_all
 import json
 import re
 from config import *
+from http_client import create_client, pool_metrics
+from patient_context import PatientContext
 
 """
 @asynccontextmanager
@@ -24,13 +25,15 @@ async def lifespan(app: FastAPI):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global embedding_model, llm, vector_store, graph, client
+    global embedding_model, llm, vector_store, graph, aggregator_client, report_client
     print("Inizio caricamento modelli...", flush=True)
     llm, embedding_model, vector_store, graph = await load_all()
     print("Modelli caricati correttamente.", flush=True)
-    client = httpx.AsyncClient(timeout=20.0)
+    aggregator_client = create_client("aggregator", AGGREGATOR_CLIENT_SETTINGS)
+    report_client = create_client("report", REPORT_CLIENT_SETTINGS)
     yield
-    await client.aclose()
+    await aggregator_client.aclose()
+    await report_client.aclose()
 
 
 
@@ -51,6 +54,10 @@ def health_token():
     """Testing >Oken check"""
     return {"status": "Token Check running"}
 
+@app.get("/metrics")
+def metrics():
+    return {"pool_wait": pool_metrics.stats()}
+
 
 
 @app.post("/llm/diagnose", response_model=Dict)
@@ -63,13 +70,28 @@ async def diagnose(data: DiagnoseRequest, request: Request):
 
         print("Ricevuta richiesta")
         user_id = request.headers.get("X-User-Id")
-        resp = await client.get(f"{AGGREGATOR_SERVICE}{AGGREGATOR_ROUTE}/{user_id}")
+        resp = await aggregator_client.get(f"{AGGREGATOR_SERVICE}{AGGREGATOR_ROUTE}/{user_id}")
+        if 400 <= resp.status_code < 500:
+            # es. paziente inesistente: nessuna diagnosi
+            raise HTTPException(status_code=resp.status_code, detail=resp.json().get("detail", "Paziente non valido"))
         resp.raise_for_status()
         
-        resp = resp.json()
+        context = PatientContext.model_validate(resp.json())
         print("appost")
-        print(resp)
-        response = graph.invoke({"sintomi": data.sintomi, "age": resp['age'], "sex": resp['sex'], "reports": resp['reports']})
+        print(context)
+        if context.degraded:
+            # contesto parziale: l'aggregator non ha ottenuto risposta da uno dei servizi
+            print("Contesto paziente parziale, mancano:", context.missing)
+        # età e fascia d'età arrivano già calcolate dall'aggregator
+        age = f"{context.age} ({context.age_bracket})" if context.age is not None else "non disponibile"
+        sex = context.sex if context.sex is not None else "non disponibile"
+        response = await graph.ainvoke({
+            "sintomi": data.sintomi,
+            "age": age,
+            "sex": sex,
+            "reports": [r.model_dump() for r in context.reports],
+            "older_reports": context.older_reports.model_dump() if context.older_reports else None,
+        })
          
         print("Ripost")
 
@@ -85,10 +107,17 @@ async def diagnose(data: DiagnoseRequest, request: Request):
 
         answer_json = json.loads(answer_text)
         
+        if not context.social_sec_number:
+            # anagrafica non disponibile (auth non ha risposto): un report senza codice fiscale
+            # non si troverebbe più con le ricerche e gli export degli operatori, quindi non si salva
+            print(f"Report del paziente {context.patient_id} non salvato: codice fiscale non disponibile")
+            answer_json["report_salvato"] = False
+            return answer_json
+
         # Costruisci il payload per /report
         report_payload = {
-            "patient_id": resp['patient_id'],
-            "social_sec_number": resp['social_sec_number'],
+            "patient_id": context.patient_id,
+            "social_sec_number": context.social_sec_number,
             "date": datetime.now().strftime("%Y-%m-%d"),
             "sintomi": data.sintomi,
             "motivazione": answer_json.get("motivazione", ""),
@@ -98,9 +127,11 @@ async def diagnose(data: DiagnoseRequest, request: Request):
 
         print(report_payload)
         
-        response = await client.post(f"{REPORT_SERVICE_URL}{REPORT_ROUTE}", json = report_payload)
+        response = await report_client.post(f"{REPORT_SERVICE_URL}{REPORT_ROUTE}", json = report_payload)
 
 
         return answer_json 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,7 +3,7 @@ from langchain_chroma import Chroma
 from langchain_huggingface import HuggingFaceEmbeddings
 import asyncio
 from langchain_google_genai import ChatGoogleGenerativeAI
-from config import API_KEY, CHROMA_HOST, CHROMA_PORT
+from config import API_KEY, CHROMA_HOST, CHROMA_PORT, LLM_MAX_CONCURRENCY
 import os
 from rag_setup import graph_building
 
@@ -40,7 +40,8 @@ async def load_all():
     # aspetta entrambi in parallelo
     llm, embedding_model = await asyncio.gather(llm_task, embedding_task)
     vector_store = await loop.run_in_executor(None, load_vector_store, embedding_model)
-    graph = await loop.run_in_executor(None, graph_building, vector_store, llm)
+    llm_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    graph = await loop.run_in_executor(None, graph_building, vector_store, llm, llm_limit)
 
     return llm, embedding_model, vector_store, graph
 
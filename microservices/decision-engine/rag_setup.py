@@ -1,21 +1,22 @@
 from langchain.prompts import PromptTemplate
 from langchain_core.documents import Document
 from langgraph.graph import START, StateGraph
-from typing_extensions import List, TypedDict, Dict
+from typing_extensions import List, TypedDict, Dict, Optional
 
 
 # Define state for application
 class State(TypedDict):
     sintomi: str
-    age: int
+    age: str            # età con fascia, es. "58 (adulto)"
     sex: str
     reports: List[Dict]
+    older_reports: Optional[Dict]
     context: List[Document]
     answer: str
 
 
 # Define application steps
-def retrieve(state: State, vector_store):
+async def retrieve(state: State, vector_store):
     query_parts = [f"Sintomi attuali: {state['sintomi']}"]
 
     # Se ci sono report precedenti, aggiungili
@@ -36,7 +37,7 @@ def retrieve(state: State, vector_store):
     query = "\n".join(query_parts)
 
     
-    retrieved_docs = vector_store.similarity_search(query, k=6)
+    retrieved_docs = await vector_store.asimilarity_search(query, k=6)
     print("\n\n--- RETRIEVED DOCS ---\n\n")
     for doc in retrieved_docs:
         print("Content: " +  doc.page_content + "\n")
@@ -47,7 +48,7 @@ def retrieve(state: State, vector_store):
     return {"context": retrieved_docs}
 
 
-def generate(state: State, llm):
+async def generate(state: State, llm, llm_limit):
     docs_content = "\n\n".join("'" + doc.page_content + "'" for doc in state["context"])
 
     print("\n\n--- DOCS CONTENT ---\n\n")
@@ -66,6 +67,16 @@ def generate(state: State, llm):
     else:
         report_text = "\n Non sono presenti report clinici precedenti associati a questo paziente \n"
 
+    # riepilogo dei report più vecchi, esclusi dall'elenco per tenere limitato il contesto
+    older = state.get("older_reports")
+    if older:
+        diagnosi = ", ".join(older.get("diagnosi") or []) or "N/A"
+        report_text += (
+            f"\n- Altri {older['count']} report precedenti "
+            f"(dal {older.get('first_date', 'N/A')} al {older.get('last_date', 'N/A')}), "
+            f"diagnosi registrate: {diagnosi}\n"
+        )
+
 
 
     print("\n\n--- REPORT TEXT ---\n\n")
@@ -73,8 +84,10 @@ def generate(state: State, llm):
     print("\n\n-----\n\n")
 
 
-    messages = prompt.invoke({"sintomi": state["sintomi"], "age": state["age"], "sex": state['sex'], "report": report_text, "context": docs_content})
-    response = llm.invoke(messages, temperature=0)
+    messages = await prompt.ainvoke({"sintomi": state["sintomi"], "age": state["age"], "sex": state['sex'], "report": report_text, "context": docs_content})
+    # il semaforo limita le chiamate a Gemini in corso contemporaneamente
+    async with llm_limit:
+        response = await llm.ainvoke(messages, temperature=0)
     return {"answer": response.content}
 
 
@@ -151,13 +164,13 @@ prompt = PromptTemplate(
     input_variables=["sintomi", "age", "sex", "report", "context"]
 )
 
-def graph_building(vector_store, llm):
+def graph_building(vector_store, llm, llm_limit):
 
-    def retrieve_step(state):
-        return retrieve(state, vector_store)
+    async def retrieve_step(state):
+        return await retrieve(state, vector_store)
     
-    def generate_step(state):
-        return generate(state, llm)
+    async def generate_step(state):
+        return await generate(state, llm, llm_limit)
         
     graph_builder = StateGraph(State).add_sequence([retrieve_step, generate_step])
     graph_builder.add_edge(START, "retrieve_step")
@@ -1,6 +1,8 @@
 from typing import Any, Dict
+import asyncio
 import httpx
-from config import URL_SERVICE, ROUTE_SERVICE
+from config import URL_SERVICE, ROUTE_SERVICE, DECISION_CLIENT_SETTINGS, DECISION_MAX_RETRIES, DECISION_RETRY_BACKOFF
+from http_client import ClientSettings, create_client
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,15 +17,39 @@ class DecisionClientError(Exception):
     pass
 
 
+# Errori per cui la richiesta non è mai arrivata al Decision Engine: si possono ritentare
+# senza rischiare di generare due report per la stessa diagnosi
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
 class DecisionClient:
-    def __init__(self, timeout: float = 10.0):
-        self.client = httpx.AsyncClient(timeout=timeout)
+    def __init__(
+        self,
+        settings: ClientSettings = DECISION_CLIENT_SETTINGS,
+        max_retries: int = DECISION_MAX_RETRIES,
+        retry_backoff: float = DECISION_RETRY_BACKOFF,
+    ):
+        # un solo client con pool di connessioni, riusato per tutte le richieste
+        self.client = create_client("decision", settings)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    async def _post(self, headers, payload: Dict[str, Any]) -> httpx.Response:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self.client.post(f"{URL_SERVICE}{ROUTE_SERVICE}", headers=headers, json=payload)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"[DecisionClient] Tentativo {attempt + 1} fallito ({e!r}), nuovo tentativo tra {delay}s")
+                await asyncio.sleep(delay)
 
     async def request(self, headers, payload: Dict[str, Any]) -> Dict[str, Any]:
         try:
             logger.debug(f"[DecisionClient] Invio richiesta a {URL_SERVICE}{ROUTE_SERVICE} con payload: {payload}")
 
-            resp = await self.client.post(f"{URL_SERVICE}{ROUTE_SERVICE}", headers=headers, json=payload)
+            resp = await self._post(headers, payload)
             resp.raise_for_status()
 
             logger.debug(f"[DecisionClient] Risposta ricevuta: {resp.text}")
@@ -52,9 +78,13 @@ class DecisionClient:
 
 
 class DecisionAdapter:
+    # creato una sola volta nel lifespan del servizio e chiuso allo shutdown
     def __init__(self):
         self.client = DecisionClient()
 
+    async def close(self):
+        await self.client.close()
+
     async def send(self, headers, ingestion_output: Dict[str, Any]) -> Dict[str, Any]:
         """
         L'ingestion_output contiene quello che il servizio di ingestion produce.
@@ -65,7 +95,9 @@ class DecisionAdapter:
         corrected_text = ingestion_output.get("corrected_text")
         
 
-        new_headers = {"X-User-Id": headers["X-User-Id"], "Authorization": headers["Authorization"]}
+        # dal WebSocket arrivano solo gli X-User-* del gateway (i browser non possono impostare Authorization):
+        # si inoltrano gli header presenti, al Decision Engine serve solo X-User-Id
+        new_headers = {key: headers.get(key) for key in ("X-User-Id", "Authorization") if headers.get(key)}
         payload = {"sintomi": corrected_text}
 
         try:
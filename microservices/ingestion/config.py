@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import os
+from http_client import settings_from_env
 
 # Carica il file .env
 load_dotenv()
@@ -9,4 +10,43 @@ AUDIO_FOLDER = os.getenv("AUDIO_FOLDER")
 TRANSCRIPTS_FOLDER = os.getenv("TRANSCRIPTS_FOLDER")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 URL_SERVICE = os.getenv("URL_SERVICE")
-ROUTE_SERVICE = os.getenv("ROUTE_SERVICE")
\ No newline at end of file
+ROUTE_SERVICE = os.getenv("ROUTE_SERVICE")
+CORRECTION_MODEL = os.getenv("CORRECTION_MODEL", "gemini-2.0-flash")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))  # chiamate all'LLM in corso contemporaneamente
+# Testo digitato: sopra questa confidenza basta il normalizzatore locale, sotto si usa l'LLM (1.0 = sempre LLM)
+NORMALIZER_MIN_CONFIDENCE = float(os.getenv("NORMALIZER_MIN_CONFIDENCE", 0.8))
+
+# Client verso il Decision Engine (variabili DECISION_SERVICE_*) e politica di retry
+DECISION_CLIENT_SETTINGS = settings_from_env("DECISION_SERVICE", read_timeout=10.0, write_timeout=10.0)
+DECISION_MAX_RETRIES = int(os.getenv("DECISION_MAX_RETRIES", 2))
+DECISION_RETRY_BACKOFF = float(os.getenv("DECISION_RETRY_BACKOFF", 0.5))  # secondi, raddoppia ad ogni tentativo
+
+# Backend di speech-to-text: "whisper" (openai-whisper) o "faster-whisper" (CTranslate2, int8 su CPU)
+STT_BACKEND = os.getenv("STT_BACKEND", "whisper")
+STT_MODEL = os.getenv("STT_MODEL", "base")
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")  # solo faster-whisper
+STT_CPU_THREADS = int(os.getenv("STT_CPU_THREADS", 0))    # solo faster-whisper, 0 = default della libreria
+
+# Pool di trascrizione: numero di worker, job in coda oltre ai worker, secondi suggeriti nel Retry-After
+STT_WORKERS = int(os.getenv("STT_WORKERS", 1))
+STT_QUEUE_SIZE = int(os.getenv("STT_QUEUE_SIZE", 4))
+STT_RETRY_AFTER = int(os.getenv("STT_RETRY_AFTER", 10))
+
+# Micro-batching della trascrizione: con STT_BATCH_SIZE > 1 gli audio arrivati entro
+# STT_BATCH_WAIT_MS vengono trascritti insieme (STT_LANGUAGE vuoto = lingua rilevata da Whisper)
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", 1))
+STT_BATCH_WAIT_MS = float(os.getenv("STT_BATCH_WAIT_MS", 50))
+STT_LANGUAGE = os.getenv("STT_LANGUAGE") or None
+
+# Trascrizione in streaming: soglia di energia (RMS) del parlato, silenzio che chiude un segmento,
+# durata massima di un segmento
+STREAM_ENERGY_THRESHOLD = float(os.getenv("STREAM_ENERGY_THRESHOLD", 0.01))
+STREAM_SILENCE_MS = int(os.getenv("STREAM_SILENCE_MS", 600))
+STREAM_MAX_SEGMENT_S = float(os.getenv("STREAM_MAX_SEGMENT_S", 30))
+
+# Cache delle correzioni LLM: entry in memoria, durata in secondi, file SQLite opzionale
+# (vuoto = solo memoria) e numero massimo di entry su disco
+CORRECTION_CACHE_SIZE = int(os.getenv("CORRECTION_CACHE_SIZE", 512))
+CORRECTION_CACHE_TTL = float(os.getenv("CORRECTION_CACHE_TTL", 86400))
+CORRECTION_CACHE_DB = os.getenv("CORRECTION_CACHE_DB") or None
+CORRECTION_CACHE_DB_SIZE = int(os.getenv("CORRECTION_CACHE_DB_SIZE", 10000))
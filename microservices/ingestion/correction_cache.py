@@ -0,0 +1,191 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+"""
+Cache delle correzioni LLM delle trascrizioni.
+
+La chiave è l'hash del testo normalizzato (Unicode NFC, spazi compattati,
+minuscolo) insieme alla versione del prompt e al nome del modello: cambiando
+prompt o modello le correzioni precedenti non vengono più usate.
+Le entry stanno in un LRU in memoria e, se configurato, anche in un file
+SQLite che sopravvive ai riavvii del servizio; entrambi i livelli hanno un TTL
+e un numero massimo di entry.
+
+Le query SQLite girano in un thread dedicato (uno solo, così la connessione non
+è mai usata da due thread insieme) per non bloccare l'event loop. Le letture non
+fanno commit: l'ultimo uso delle entry viene annotato in memoria e scritto sul
+file insieme alla put successiva, oppure ogni TOUCH_BATCH letture.
+"""
+
+TOUCH_BATCH = 100
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+class CorrectionCache:
+    def __init__(
+        self,
+        prompt_version: str,
+        model_name: str,
+        max_size: int = 512,
+        ttl: float = 86400.0,
+        sqlite_path: str = None,
+        sqlite_max_size: int = 10000,
+    ):
+        self._prefix = f"{prompt_version}\x00{model_name}\x00"
+        self._max_size = max_size
+        self._ttl = ttl
+        self._sqlite_max_size = sqlite_max_size
+        self._entries = OrderedDict()      # chiave -> (testo corretto, latenza, token, scadenza)
+        self._touched = {}                 # chiave -> ultimo uso non ancora scritto su SQLite
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS corrections ("
+                " key TEXT PRIMARY KEY, corrected TEXT NOT NULL, latency REAL NOT NULL,"
+                " tokens INTEGER NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS corrections_last_used ON corrections (last_used)")
+            self._db.commit()
+            self._disk = ThreadPoolExecutor(max_workers=1, thread_name_prefix="correction-cache")
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_latency = 0.0           # secondi di chiamate LLM evitate
+        self.saved_tokens = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256((self._prefix + normalize_text(text)).encode("utf-8")).hexdigest()
+
+    async def _on_disk(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._disk, fn, *args)
+
+    async def get(self, key: str):
+        """Restituisce il testo corretto in cache oppure None."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                corrected, latency, tokens, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._record_hit(latency, tokens, disk=False)
+                    self._touch(key, now)
+                    return corrected
+                del self._entries[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+
+        row = await self._on_disk(self._select, key)
+        with self._lock:
+            if row is not None and row[3] > now:
+                corrected, latency, tokens, expires_at = row
+                self._remember(key, (corrected, latency, tokens, expires_at))
+                self._record_hit(latency, tokens, disk=True)
+                self._touch(key, now)
+                touched = self._take_touched() if len(self._touched) >= TOUCH_BATCH else None
+            else:
+                # le entry scadute restano sul file fino alla prossima put, che le elimina
+                self.misses += 1
+                return None
+        if touched:
+            await self._on_disk(self._write, None, touched)
+        return corrected
+
+    async def put(self, key: str, corrected: str, latency: float, tokens: int = 0):
+        """Salva la correzione con la latenza e i token spesi per ottenerla."""
+        now = time.time()
+        entry = (corrected, latency, tokens, now + self._ttl)
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is None:
+                return
+            touched = self._take_touched()
+            touched.pop(key, None)
+        await self._on_disk(self._write, (key, *entry, now), touched)
+
+    def _touch(self, key: str, now: float):
+        if self._db is not None:
+            self._touched[key] = now
+
+    def _take_touched(self) -> dict:
+        touched, self._touched = self._touched, {}
+        return touched
+
+    # ---- eseguiti nel thread di SQLite ----
+
+    def _select(self, key: str):
+        return self._db.execute(
+            "SELECT corrected, latency, tokens, expires_at FROM corrections WHERE key = ?", (key,)
+        ).fetchone()
+
+    def _write(self, row: tuple, touched: dict):
+        """Scrive gli ultimi usi annotati e, se presente, la nuova entry, con un solo commit."""
+        if touched:
+            self._db.executemany(
+                "UPDATE corrections SET last_used = ? WHERE key = ?", [(used, key) for key, used in touched.items()]
+            )
+        if row is not None:
+            self._db.execute("INSERT OR REPLACE INTO corrections VALUES (?, ?, ?, ?, ?, ?)", row)
+            self._db.execute("DELETE FROM corrections WHERE expires_at <= ?", (row[-1],))
+            # oltre il limite si eliminano le entry usate meno di recente
+            self._db.execute(
+                "DELETE FROM corrections WHERE key IN ("
+                " SELECT key FROM corrections ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self._sqlite_max_size,),
+            )
+        self._db.commit()
+
+    def _remember(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+
+    def _record_hit(self, latency: float, tokens: int, disk: bool):
+        if disk:
+            self.disk_hits += 1
+        else:
+            self.memory_hits += 1
+        self.saved_latency += latency
+        self.saved_tokens += tokens
+
+    def close(self):
+        if self._db is not None:
+            self._disk.shutdown(wait=True)
+            with self._lock:
+                touched = self._take_touched()
+            self._write(None, touched)
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "sqlite": self._db is not None,
+                "pending_touches": len(self._touched),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "saved_latency_s": round(self.saved_latency, 3),
+                "saved_tokens": self.saved_tokens,
+            }
@@ -1,21 +1,100 @@
 import os
 import json
+import contextlib
+import subprocess
+import tempfile
+import time
 from datetime import datetime
+import numpy as np
 from langchain_core.messages import HumanMessage
 
-def transcribe_audio_file(stt_model, audio_path: str) -> str:
+SAMPLE_RATE = 16000
+
+
+def _ffmpeg_to_pcm(input_args: list, data: bytes = None) -> np.ndarray:
+    # stessi parametri usati da whisper.load_audio, ma con output su stdout
+    cmd = [
+        "ffmpeg", "-hide_banner", "-threads", "0",
+        *input_args,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "-",
+    ]
+    if data is None:
+        cmd.insert(1, "-nostdin")
+    out = subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    return np.frombuffer(out, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def decode_audio_bytes(data: bytes) -> np.ndarray:
     """
-    Trascrive un singolo file audio con Whisper
+    Decodifica l'audio ricevuto in un buffer PCM float32 mono a 16 kHz (il formato atteso da Whisper)
+    passando i byte a ffmpeg tramite stdin/stdout, senza scrivere l'upload su disco.
     """
     try:
-        print(f"Trascrizione in corso: {audio_path}")
-        result = stt_model.transcribe(audio_path)
-        return result["text"]
+        return _ffmpeg_to_pcm(["-i", "pipe:0"], data)
+    except subprocess.CalledProcessError:
+        # alcuni contenitori (es. m4a/mp4 con indice a fine file) non si possono leggere da una pipe:
+        # solo in questo caso si passa da un file temporaneo con nome univoco
+        with tempfile.NamedTemporaryFile(suffix=".audio") as tmp:
+            tmp.write(data)
+            tmp.flush()
+            try:
+                return _ffmpeg_to_pcm(["-i", tmp.name])
+            except subprocess.CalledProcessError as e:
+                raise RuntimeError(f"Audio non decodificabile: {e.stderr.decode(errors='ignore').strip()}") from e
+
+
+def load_audio_input(audio):
+    """
+    Restituisce l'audio in un formato accettato dal backend STT:
+    i byte dell'upload vengono decodificati in memoria, percorsi e array passano invariati.
+    """
+    if isinstance(audio, (bytes, bytearray)):
+        return decode_audio_bytes(bytes(audio))
+    return audio
+
+
+def describe_audio(audio) -> str:
+    if isinstance(audio, (bytes, bytearray)):
+        return f"audio in memoria ({len(audio)} byte)"
+    if isinstance(audio, np.ndarray):
+        return f"segmento audio ({len(audio) / SAMPLE_RATE:.1f}s)"
+    return str(audio)
+
+
+def transcribe_audio_file(stt_model, audio, language: str = None) -> str:
+    """
+    Trascrive un singolo audio (byte dell'upload, percorso o array PCM) con il backend STT
+    """
+    try:
+        print(f"Trascrizione in corso: {describe_audio(audio)}")
+        return stt_model.transcribe(load_audio_input(audio), language=language)
     except Exception as e:
-        print(f"Errore durante la trascrizione di {audio_path}: {e}")
+        print(f"Errore durante la trascrizione di {describe_audio(audio)}: {e}")
         raise
 
 
+def transcribe_audio_batch(stt_model, audios: list, language: str = None) -> list:
+    """
+    Trascrive più audio insieme con il backend STT.
+    Restituisce, nell'ordine, il testo oppure l'eccezione che ne ha impedito la trascrizione.
+    """
+    print(f"Trascrizione batch in corso: {len(audios)} audio")
+    decoded, results = [], [None] * len(audios)
+    for i, audio in enumerate(audios):
+        try:
+            decoded.append((i, load_audio_input(audio)))
+        except Exception as e:
+            print(f"Errore durante la decodifica di {describe_audio(audio)}: {e}")
+            results[i] = e
+
+    if decoded:
+        texts = stt_model.transcribe_batch([samples for _, samples in decoded], language=language)
+        for (i, _), text in zip(decoded, texts):
+            results[i] = text
+    return results
+
+
 
 def save_transcription(text: str, filename: str) -> str:
     """
@@ -34,9 +113,20 @@ def save_transcription(text: str, filename: str) -> str:
         print(f"Errore durante il salvataggio: {e}")
         raise
 
+# Versione del prompt di correzione: va incrementata ad ogni modifica del prompt,
+# così le correzioni in cache ottenute con il prompt precedente non vengono più usate
+CORRECTION_PROMPT_VERSION = "1"
+
+
 # Funzione per correggere la trascrizione clinica
-def correct_transcription(llm, transcription: str) -> str:
- 
+async def correct_transcription(llm, transcription: str, cache=None, limit=None) -> str:
+    if cache is not None:
+        key = cache.key(transcription)
+        cached = await cache.get(key)
+        if cached is not None:
+            print("Correzione recuperata dalla cache")
+            return cached
+
     prompt = f"""
     Sei un assistente medico. Ti fornisco una trascrizione vocale di un paziente che potrebbe contenere:
      - errori ortografici
@@ -68,5 +158,13 @@ def correct_transcription(llm, transcription: str) -> str:
     Output atteso:
     """
     message = HumanMessage(content=prompt)
-    response = llm.invoke([message])
-    return response.content
\ No newline at end of file
+    # il semaforo (se presente) limita le chiamate a Gemini in corso contemporaneamente
+    async with limit or contextlib.nullcontext():
+        start = time.perf_counter()
+        response = await llm.ainvoke([message])
+        latency = time.perf_counter() - start
+
+    if cache is not None:
+        usage = getattr(response, "usage_metadata", None) or {}
+        await cache.put(key, response.content, latency, tokens=usage.get("total_tokens", 0))
+    return response.content
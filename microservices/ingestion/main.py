@@ -1,35 +1,135 @@
 import os
+import json
+import time
+import asyncio
 from datetime import datetime
 
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request
-from contextlib import asynccontextmanager
-from ingest_ops import transcribe_audio_file, save_transcription, correct_transcription
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Request, WebSocket, WebSocketDisconnect
+from contextlib import asynccontextmanager, aclosing
+from ingest_ops import save_transcription, correct_transcription, CORRECTION_PROMPT_VERSION
+from correction_cache import CorrectionCache
+from normalizer import normalize_typed_text, CorrectionTimings
 from model import load_model_stt, load_model_correction
 from adapter import DecisionAdapter
+from stt_pool import TranscriptionPool, TranscriptionQueueFull
+from http_client import pool_metrics
+from streaming import VoiceActivitySegmenter, DuplexStreamingResponse, pcm_stream
+from config import STT_WORKERS, STT_QUEUE_SIZE, STT_RETRY_AFTER, STT_BATCH_SIZE, STT_BATCH_WAIT_MS, STT_LANGUAGE
+from config import STREAM_ENERGY_THRESHOLD, STREAM_SILENCE_MS, STREAM_MAX_SEGMENT_S
+from config import NORMALIZER_MIN_CONFIDENCE, LLM_MAX_CONCURRENCY, CORRECTION_MODEL, CORRECTION_CACHE_SIZE, CORRECTION_CACHE_TTL, CORRECTION_CACHE_DB, CORRECTION_CACHE_DB_SIZE
 
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Caricamento modello Whisper all'avvio del servizio
-    global stt_model, correction_model
+    global stt_model, correction_model, correction_cache, llm_limit, decision_adapter, transcription_pool
     # Creazione cartelle se non esistono    
-    os.makedirs("audio", exist_ok=True)
     os.makedirs("transcripts", exist_ok=True)
     stt_model = load_model_stt()
     correction_model = load_model_correction() 
+    llm_limit = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    correction_cache = CorrectionCache(
+        CORRECTION_PROMPT_VERSION,
+        CORRECTION_MODEL,
+        max_size=CORRECTION_CACHE_SIZE,
+        ttl=CORRECTION_CACHE_TTL,
+        sqlite_path=CORRECTION_CACHE_DB,
+        sqlite_max_size=CORRECTION_CACHE_DB_SIZE,
+    )
     print("Modello caricato correttamente.")
+    transcription_pool = TranscriptionPool(
+        stt_model,
+        workers=STT_WORKERS,
+        queue_size=STT_QUEUE_SIZE,
+        batch_size=STT_BATCH_SIZE,
+        batch_wait_ms=STT_BATCH_WAIT_MS,
+        language=STT_LANGUAGE,
+    )
+    transcription_pool.start()
+    decision_adapter = DecisionAdapter()
     yield
+    await decision_adapter.close()
+    await transcription_pool.shutdown()
+    correction_cache.close()
 
 
 app = FastAPI(title="Ingestion Microservice", lifespan=lifespan)
+correction_timings = CorrectionTimings()
 
 @app.get("/")
 async def health_check():
     return {"status": "T'appost ! Il microservizio di ingestion è attivo."}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "transcription": transcription_pool.stats(),
+        "correction_cache": correction_cache.stats(),
+        "correction_paths": correction_timings.stats(),
+        "pool_wait": pool_metrics.stats(),
+    }
+
+
+async def complete_ingestion(headers, raw_text: str, input_type: str, filename: str = None) -> dict:
+    """
+    Fasi comuni dopo la trascrizione: correzione del testo, salvataggio
+    e invio al Decision Engine. Solleva HTTPException in caso di errore.
+    """
+    corrected_text = None
+    if input_type == "text":
+        # il testo digitato non ha rumore di trascrizione: se è pulito basta il normalizzatore locale
+        start = time.perf_counter()
+        normalized, confidence = normalize_typed_text(raw_text)
+        if confidence >= NORMALIZER_MIN_CONFIDENCE:
+            corrected_text = normalized
+            correction_timings.record("local", time.perf_counter() - start)
+            print(f"testo normalizzato localmente (confidenza {confidence:.2f})")
+        else:
+            print(f"confidenza {confidence:.2f} sotto la soglia, correzione con LLM")
+
+    if corrected_text is None:
+        start = time.perf_counter()
+        try:
+            corrected_text = await correct_transcription(
+                correction_model, transcription=raw_text, cache=correction_cache, limit=llm_limit
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Errore durante la correzione: {e}")
+        correction_timings.record("llm", time.perf_counter() - start)
+
+    print("testo corretto")
+
+    try:
+        os.makedirs("transcripts", exist_ok=True)
+        prefix = "manual" if input_type == "text" else input_type
+        base_filename = os.path.splitext(filename)[0] if filename else f"{prefix}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        save_transcription(corrected_text, base_filename)
+        print(f"Trascrizione salvata: {base_filename}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore durante il salvataggio della trascrizione: {e}")
+
+    
+    output_ingest = {
+        "input_type": input_type,
+        "filename": filename,
+        "corrected_text": corrected_text,
+        "timestamp": datetime.now().strftime('%Y-%m-%dT%H-%M-%S')
+    }
+
+    print("Sending Decision")
+
+    try:
+        response = await decision_adapter.send(headers=headers, ingestion_output=output_ingest)
+        print("Risposta dal Decision Service:", response)
+        return response
+
+    except ConnectionError as e:
+        raise HTTPException(status_code=502, detail=f"Decision Service non raggiungibile: {e}")
+
+
 @app.post("/ingestion", response_model=dict)
 async def ingest(
     request: Request, 
@@ -51,31 +151,26 @@ async def ingest(
 
 
         if file:
-            audio_path = os.path.join("audio", file.filename)
-            os.makedirs("audio", exist_ok=True)
-
+            # l'audio resta in memoria: viene decodificato dai byte ricevuti e passato
+            # direttamente al modello, senza file su disco (e senza collisioni tra upload con lo stesso nome)
             try:
-                with open(audio_path, "wb") as buffer:
-                    buffer.write(await file.read())
-                print(f"Audio salvato: {audio_path}")
+                audio_bytes = await file.read()
+                print(f"Audio ricevuto: {file.filename} ({len(audio_bytes)} byte)")
             except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Errore salvataggio file audio: {e}")
+                raise HTTPException(status_code=500, detail=f"Errore lettura file audio: {e}")
 
             try:
-                print("Trascrizione in corso:", audio_path)
-                raw_text = transcribe_audio_file(stt_model, audio_path)
-            except FileNotFoundError:
-                raise HTTPException(status_code=500, detail="File audio non trovato per la trascrizione.")
+                print("Trascrizione in corso:", file.filename)
+                raw_text = await transcription_pool.transcribe(audio_bytes)
+            except TranscriptionQueueFull:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Troppe trascrizioni in corso, riprovare più tardi.",
+                    headers={"Retry-After": str(STT_RETRY_AFTER)},
+                )
             except Exception as e:
                 raise HTTPException(status_code=500, detail=f"Errore durante la trascrizione: {e}")
 
-            finally:
-                try:
-                    os.remove(audio_path)
-                    print(f"Audio {audio_path} eliminato")
-                except Exception as cleanup_error:
-                    print(f"Errore eliminazione {audio_path}: {cleanup_error}")
-
 
         elif text:
             print("testo ricevuto")
@@ -83,43 +178,158 @@ async def ingest(
             if not raw_text:
                 raise HTTPException(status_code=400, detail="Testo vuoto non valido.")
 
-        try:
-            corrected_text = correct_transcription(correction_model, transcription=raw_text)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Errore durante la correzione: {e}")
+        return await complete_ingestion(
+            request.headers,
+            raw_text,
+            input_type="audio" if file else "text",
+            filename=file.filename if file else None,
+        )
 
-        print("testo corretto")
+    except HTTPException:
+        # Propaga le eccezioni già gestite
+        raise
 
-        try:
-            os.makedirs("transcripts", exist_ok=True)
-            base_filename = os.path.splitext(file.filename)[0] if file else f"manual_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            save_transcription(corrected_text, base_filename)
-            print(f"Trascrizione salvata: {base_filename}")
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Errore durante il salvataggio della trascrizione: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Errore interno non gestito: {e}")
 
-        
-        output_ingest = {
-            "input_type": "audio" if file else "text",
-            "filename": file.filename if file else None,
-            "corrected_text": corrected_text,
-            "timestamp": datetime.now().strftime('%Y-%m-%dT%H-%M-%S')
-        }
 
-        print("Sending Decision")
 
+async def transcription_session(chunks, content_type: str, headers):
+    """
+    Trascrizione incrementale di una registrazione: legge l'audio a blocchi da chunks
+    e produce gli eventi (dict) da inviare al client:
+    - {"type": "partial", "segment": n, "text": ...} per ogni segmento trascritto
+    - {"type": "transcript", "text": ...} con la trascrizione completa a fine registrazione
+    - {"type": "result", "response": ...} con la risposta del Decision Engine
+    - {"type": "error", "detail": ...} in caso di errore
+    I segmenti della stessa registrazione vengono trascritti uno alla volta e, se il pool
+    è pieno, aspettano un posto libero invece di far fallire l'intera registrazione.
+    """
+    segmenter = VoiceActivitySegmenter(
+        energy_threshold=STREAM_ENERGY_THRESHOLD,
+        silence_ms=STREAM_SILENCE_MS,
+        max_segment_s=STREAM_MAX_SEGMENT_S,
+    )
+    segments = asyncio.Queue()   # segmenti chiusi in attesa di trascrizione (None = fine audio)
+    events = asyncio.Queue()     # eventi per il client (None = trascrizione terminata)
+    texts = []
+    errors = []
+
+    async def read_audio():
         try:
-            adapter = DecisionAdapter()
-            response = await adapter.send(headers=request.headers, ingestion_output=output_ingest)
-            print("Risposta dal Decision Service:", response)
-            return response
+            async for samples in pcm_stream(chunks, content_type):
+                for segment in segmenter.feed(samples):
+                    segments.put_nowait(segment)
+            last = segmenter.flush()
+            if last is not None:
+                segments.put_nowait(last)
+        except Exception as e:
+            errors.append("audio")
+            await events.put({"type": "error", "detail": f"Errore durante la lettura dell'audio: {e}"})
+        finally:
+            segments.put_nowait(None)
 
-        except ConnectionError as e:
-            raise HTTPException(status_code=502, detail=f"Decision Service non raggiungibile: {e}")
+    async def transcribe_segments():
+        index = 0
+        while (segment := await segments.get()) is not None:
+            if errors:
+                # registrazione già fallita: i segmenti rimanenti non vengono trascritti
+                continue
+            try:
+                text = (await transcription_pool.transcribe(segment, wait=True)).strip()
+                texts.append(text)
+                await events.put({"type": "partial", "segment": index, "text": text})
+            except Exception as e:
+                errors.append(index)
+                await events.put({"type": "error", "detail": f"Errore durante la trascrizione del segmento {index}: {e}"})
+            index += 1
+        await events.put(None)
 
-    except HTTPException:
-        # Propaga le eccezioni già gestite
-        raise
+    reader = asyncio.create_task(read_audio())
+    transcriber = asyncio.create_task(transcribe_segments())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+    finally:
+        # client disconnesso: si interrompono lettura e trascrizioni ancora in corso,
+        # liberando i posti del pool occupati per questa registrazione
+        for task in (reader, transcriber):
+            if not task.done():
+                task.cancel()
 
+    if errors:
+        return
+    raw_text = " ".join(text for text in texts if text)
+    if not raw_text:
+        yield {"type": "error", "detail": "Nessun parlato rilevato nella registrazione."}
+        return
+    yield {"type": "transcript", "text": raw_text}
+
+    try:
+        response = await complete_ingestion(headers, raw_text, input_type="stream")
+        yield {"type": "result", "response": response}
+    except HTTPException as e:
+        yield {"type": "error", "detail": e.detail}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Errore interno non gestito: {e}")
+        yield {"type": "error", "detail": f"Errore interno non gestito: {e}"}
+
+
+@app.post("/ingestion/stream")
+async def ingest_stream(request: Request):
+    """
+    Endpoint per le registrazioni lunghe: riceve l'audio a blocchi mentre viene registrato
+    (upload chunked; Content-Type audio/pcm o audio/l16 per PCM 16 bit mono a 16 kHz,
+    altrimenti un formato leggibile da ffmpeg) e risponde in streaming con una riga JSON
+    per evento (vedi transcription_session).
+
+    Attraverso il gateway gli eventi "partial" arrivano solo a registrazione finita:
+    il proxy HTTP/1.1 invia tutto il body prima di leggere la risposta. Per ricevere
+    le trascrizioni parziali mentre il paziente parla si usa il WebSocket /ingestion/ws.
+    """
+    content_type = request.headers.get("content-type", "")
+    print("Registrazione in streaming avviata:", content_type or "formato non indicato")
+
+    async def lines():
+        async for event in transcription_session(request.stream(), content_type, request.headers):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return DuplexStreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.websocket("/ingestion/ws")
+async def ingest_websocket(websocket: WebSocket, content_type: str = ""):
+    """
+    Registrazione in streaming su WebSocket (full-duplex anche attraverso il gateway):
+    il client invia l'audio come messaggi binari e il testo "end" a fine registrazione,
+    e riceve gli eventi di transcription_session come messaggi JSON mentre parla.
+    Il formato dell'audio si indica con ?content_type= (come per /ingestion/stream).
+    """
+    await websocket.accept()
+    print("Registrazione WebSocket avviata:", content_type or "formato non indicato")
+    disconnected = False
+
+    async def chunks():
+        nonlocal disconnected
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                disconnected = True
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                yield message["bytes"]
+            elif message.get("text") == "end":
+                return
+
+    try:
+        async with aclosing(transcription_session(chunks(), content_type, websocket.headers)) as session:
+            async for event in session:
+                if disconnected:
+                    # chiudendo la sessione si annullano le trascrizioni ancora in corso
+                    break
+                await websocket.send_json(event)
+        if not disconnected:
+            await websocket.close()
+    except WebSocketDisconnect:
+        disconnected = True
+    if disconnected:
+        print("Registrazione WebSocket interrotta dal client")
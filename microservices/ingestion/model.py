@@ -1,20 +1,20 @@
-import whisper
 from langchain_google_genai import ChatGoogleGenerativeAI
-from config import GOOGLE_API_KEY
+from config import GOOGLE_API_KEY, CORRECTION_MODEL, STT_BACKEND, STT_MODEL, STT_COMPUTE_TYPE, STT_CPU_THREADS
+from stt_backends import FasterWhisperBackend, load_backend
 import os
 
 # File in cui sono presenti i modelli per lo speech-to-text e per la correzione delle trascrizioni
 
-# Caricamento modello Whisper una sola volta
-MODEL_NAME = "base"
-
 # Impostazione delle credenziali Google Cloud
 os.environ["GOOGLE_API_KEY"] = GOOGLE_API_KEY
  
 
-def load_model_stt(): # modello per lo speech-to-text
-    return whisper.load_model(MODEL_NAME)
+def load_model_stt(): # modello per lo speech-to-text, caricato una sola volta
+    options = {}
+    if STT_BACKEND == FasterWhisperBackend.name:
+        options = {"compute_type": STT_COMPUTE_TYPE, "cpu_threads": STT_CPU_THREADS}
+    return load_backend(STT_BACKEND, STT_MODEL, **options)
 
 
 def load_model_correction(): # modello per la correzione delle trascrizioni
-    return ChatGoogleGenerativeAI(model="gemini-2.0-flash")
+    return ChatGoogleGenerativeAI(model=CORRECTION_MODEL)
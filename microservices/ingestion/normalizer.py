@@ -0,0 +1,145 @@
+import os
+import re
+import threading
+import unicodedata
+
+"""
+Normalizzatore locale per il testo digitato dal paziente.
+
+Il testo scritto non ha il rumore della trascrizione vocale: se è pulito basta
+compattare spazi e punteggiatura e affiancare ai termini comuni quelli clinici
+usando il lessico qui sotto, senza chiamare l'LLM. La confidenza stima quanto il
+testo sembri pulito (anche confrontando le parole con il vocabolario in
+vocabolario.txt); sotto la soglia configurata si passa alla correzione LLM.
+"""
+
+# termine comune -> termine clinico. L'espressione del paziente resta com'è e il termine
+# clinico viene aggiunto tra parentesi: sostituirla romperebbe la frase
+# (es. "non riesco a respirare bene" -> "dispnea bene", "ho il fiatone" -> "ho il dispnea")
+LEXICON = {
+    "dolore al petto": "dolore toracico",
+    "male al petto": "dolore toracico",
+    "dolore alla pancia": "dolore addominale",
+    "male alla pancia": "dolore addominale",
+    "mal di pancia": "dolore addominale",
+    "dolore allo stomaco": "dolore epigastrico",
+    "mal di stomaco": "dolore epigastrico",
+    "mal di testa": "cefalea",
+    "dolore alla testa": "cefalea",
+    "male alla testa": "cefalea",
+    "mal di schiena": "lombalgia",
+    "mal di gola": "faringodinia",
+    "fiato corto": "dispnea",
+    "fiatone": "dispnea",
+    "difficoltà a respirare": "dispnea",
+    "non riesco a respirare": "dispnea",
+    "giramento di testa": "vertigini",
+    "giramenti di testa": "vertigini",
+    "mi gira la testa": "vertigini",
+    "battito accelerato": "tachicardia",
+    "cuore che batte forte": "palpitazioni",
+    "pressione alta": "ipertensione",
+    "pressione bassa": "ipotensione",
+    "vomito con sangue": "vomito ematico",
+    "vomito di sangue": "vomito ematico",
+    "sangue dal naso": "epistassi",
+    "sangue nelle urine": "ematuria",
+    "sangue nelle feci": "ematochezia",
+    "bruciore a urinare": "disuria",
+    "svenimento": "sincope",
+    "sono svenuto": "sincope",
+    "sono svenuta": "sincope",
+}
+
+# un solo passaggio con le espressioni più lunghe per prime, così il testo aggiunto non viene riletto
+_LEXICON_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(lay) for lay in sorted(LEXICON, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+_VOWELS = set("aeiouàèéìòóù")
+_UNITS = {"mg", "ml", "mmhg", "kg", "cm", "mm", "bpm", "ecg", "tc", "rm", "ps"}
+_ALLOWED_CHARS = re.compile(r"[\w\s.,;:!?'\"()/%°+\-àèéìòóù]", re.UNICODE)
+
+# penalità per ogni parola fuori vocabolario: con la soglia di default (0.8) basta una
+# parola sconosciuta o scritta male (es. "dolre", "febre") per passare alla correzione LLM
+OOV_PENALTY = 0.25
+
+
+def _load_vocabulary(path: str) -> set:
+    with open(path, encoding="utf-8") as f:
+        words = {line.strip().lower() for line in f if line.strip() and not line.startswith("#")}
+    # anche le parole del lessico (comuni e cliniche) sono parole note
+    for expression in list(LEXICON) + list(LEXICON.values()):
+        words.update(_WORD.findall(expression.lower()))
+    return words | _UNITS
+
+
+VOCABULARY = _load_vocabulary(os.path.join(os.path.dirname(os.path.abspath(__file__)), "vocabolario.txt"))
+
+
+def text_confidence(text: str) -> float:
+    """
+    Stima tra 0 e 1 di quanto il testo sembri scritto in modo pulito.
+    Penalizza parole fuori vocabolario, parole senza vocali, lettere ripetute
+    (es. "dolooore"), parole incollate molto lunghe, caratteri insoliti e testi con poche parole.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return 0.0
+
+    no_vowels = sum(1 for w in words if len(w) > 1 and not (set(w) & _VOWELS) and w not in _UNITS)
+    repeated = sum(1 for w in words if re.search(r"(.)\1\1", w))
+    too_long = sum(1 for w in words if len(w) > 20)
+    noisy_words = (no_vowels + repeated + too_long) / len(words)
+
+    odd_chars = sum(1 for c in text if not _ALLOWED_CHARS.match(c)) / max(len(text), 1)
+
+    unknown = sum(1 for w in words if w not in VOCABULARY)
+
+    confidence = 1.0 - 2 * noisy_words - 5 * odd_chars - OOV_PENALTY * unknown
+    if len(words) < 3:
+        confidence -= 0.3
+    return max(0.0, min(1.0, confidence))
+
+
+def normalize_typed_text(text: str) -> tuple:
+    """
+    Normalizza il testo digitato e restituisce (testo normalizzato, confidenza).
+    """
+    text = unicodedata.normalize("NFC", text)
+    confidence = text_confidence(text)
+
+    normalized = re.sub(r"\s+", " ", text).strip()
+    normalized = re.sub(r"\s+([.,;:!?])", r"\1", normalized)
+    normalized = re.sub(r"([.,;:!?])(?=[^\s\d.,;:!?])", r"\1 ", normalized)
+    normalized = _LEXICON_PATTERN.sub(
+        lambda match: f"{match.group(0)} ({LEXICON[match.group(0).lower()]})", normalized
+    )
+
+    if normalized:
+        normalized = normalized[0].upper() + normalized[1:]
+        if normalized[-1] not in ".!?":
+            normalized += "."
+    return normalized, confidence
+
+
+class CorrectionTimings:
+    """Numero di correzioni e tempo totale per percorso (normalizzatore locale o LLM)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {}
+
+    def record(self, path: str, seconds: float):
+        with self._lock:
+            count, total = self._paths.get(path, (0, 0.0))
+            self._paths[path] = (count + 1, total + seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                path: {"count": count, "avg_ms": round(total / count * 1000, 2)}
+                for path, (count, total) in self._paths.items()
+            }
@@ -0,0 +1,186 @@
+import asyncio
+import numpy as np
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from ingest_ops import SAMPLE_RATE
+
+"""
+Supporto alla trascrizione incrementale delle registrazioni lunghe.
+
+Il client invia l'audio a blocchi mentre registra (upload chunked); l'audio viene
+decodificato in streaming, diviso in segmenti in base all'attività vocale e ogni
+segmento viene trascritto appena chiuso. Quando la registrazione termina resta da
+trascrivere solo l'ultimo segmento, invece dell'intera registrazione.
+"""
+
+# Content-Type di audio già in PCM 16 bit mono a 16 kHz: non serve passare da ffmpeg.
+# Il PCM va dichiarato esplicitamente: qualsiasi altro tipo (anche application/octet-stream
+# o nessun tipo) viene decodificato da ffmpeg, che riconosce da solo il formato (wav, webm, ogg...)
+RAW_PCM_CONTENT_TYPES = ("audio/l16", "audio/pcm")
+
+
+class AudioDecodeError(Exception):
+    """ffmpeg non è riuscito a decodificare l'audio ricevuto."""
+    pass
+
+
+class VoiceActivitySegmenter:
+    """
+    Segmentazione basata sull'energia dei frame: un segmento si chiude dopo
+    silence_ms di silenzio successivi a del parlato, oppure quando raggiunge max_segment_s.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        energy_threshold: float = 0.01,
+        silence_ms: int = 600,
+        max_segment_s: float = 30.0,
+        min_speech_ms: int = 200,
+        preroll_ms: int = 300,
+    ):
+        self.frame_size = sample_rate * frame_ms // 1000
+        self.energy_threshold = energy_threshold
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.max_frames = int(max_segment_s * 1000 // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.preroll_frames = preroll_ms // frame_ms
+        self._pending = np.zeros(0, dtype=np.float32)  # campioni che non formano ancora un frame intero
+        self._frames = []                             # frame del segmento corrente
+        self._speech_frames = 0
+        self._silent_run = 0
+
+    def _close_segment(self):
+        segment = None
+        if self._speech_frames >= self.min_speech_frames:
+            segment = np.concatenate(self._frames)
+        self._frames = []
+        self._speech_frames = 0
+        self._silent_run = 0
+        return segment
+
+    def feed(self, samples: np.ndarray) -> list:
+        """Aggiunge campioni float32 e restituisce i segmenti chiusi nel frattempo."""
+        segments = []
+        buffer = np.concatenate([self._pending, samples])
+        n_frames = len(buffer) // self.frame_size
+
+        for i in range(n_frames):
+            frame = buffer[i * self.frame_size:(i + 1) * self.frame_size]
+            is_speech = float(np.sqrt(np.mean(frame ** 2))) >= self.energy_threshold
+            self._frames.append(frame)
+
+            if is_speech:
+                self._speech_frames += 1
+                self._silent_run = 0
+            elif self._speech_frames == 0:
+                # ancora nessun parlato: si tiene solo un breve pre-roll per non tagliare l'attacco
+                self._frames = self._frames[-self.preroll_frames:] if self.preroll_frames else []
+                continue
+            else:
+                self._silent_run += 1
+
+            if self._silent_run >= self.silence_frames or len(self._frames) >= self.max_frames:
+                segment = self._close_segment()
+                if segment is not None:
+                    segments.append(segment)
+
+        self._pending = buffer[n_frames * self.frame_size:]
+        return segments
+
+    def flush(self):
+        """Chiude la registrazione e restituisce l'ultimo segmento (o None)."""
+        if len(self._pending):
+            self._frames.append(self._pending)
+            self._pending = np.zeros(0, dtype=np.float32)
+        if not self._frames:
+            return None
+        return self._close_segment()
+
+
+def pcm16_to_float32(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+
+async def pcm_stream(chunks, content_type: str):
+    """
+    Converte i blocchi ricevuti dal client in array float32 a 16 kHz.
+    L'audio PCM 16 bit viene convertito direttamente, gli altri formati (webm/ogg/wav...)
+    vengono decodificati in streaming da un processo ffmpeg alimentato via stdin.
+    Solleva AudioDecodeError, con codice di uscita e messaggio di ffmpeg, se la decodifica fallisce.
+    """
+    if content_type.lower().startswith(RAW_PCM_CONTENT_TYPES):
+        leftover = b""
+        async for chunk in chunks:
+            data = leftover + chunk
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            if usable:
+                yield pcm16_to_float32(data[:usable])
+        return
+
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    async def feed():
+        try:
+            async for chunk in chunks:
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed())
+    # stderr letto in parallelo, così ffmpeg non si blocca se scrive molti errori
+    errors = asyncio.create_task(process.stderr.read())
+    try:
+        leftover = b""
+        while True:
+            data = await process.stdout.read(SAMPLE_RATE)  # ~0.5 s di audio per lettura
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            if usable:
+                yield pcm16_to_float32(data[:usable])
+        # prima il codice di uscita: se ffmpeg si è fermato per un errore, la scrittura su stdin
+        # fallisce con un broken pipe che non dice nulla sul problema
+        returncode = await process.wait()
+        if returncode != 0:
+            detail = (await errors).decode("utf-8", errors="replace").strip()
+            raise AudioDecodeError(f"ffmpeg terminato con codice {returncode}: {detail[-500:] or 'nessun dettaglio'}")
+        await feeder
+    finally:
+        if not feeder.done():
+            feeder.cancel()
+        if not errors.done():
+            errors.cancel()
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse che legge il body della richiesta mentre invia la risposta.
+
+    Con i server ASGI precedenti alla spec 2.4 StreamingResponse avvia un task che
+    chiama receive() per accorgersi della disconnessione del client: quel task
+    consumerebbe i blocchi di audio che il generatore sta leggendo con request.stream().
+    Qui la disconnessione arriva comunque al generatore, come ClientDisconnect da request.stream().
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,121 @@
+"""
+Backend di speech-to-text selezionabili da configurazione (STT_BACKEND).
+
+- "whisper": openai-whisper, il modello originale in fp32 (o fp16 su GPU)
+- "faster-whisper": implementazione CTranslate2 quantizzata int8 per nodi solo CPU
+  (pacchetto faster-whisper, incluso nei requirements del servizio)
+
+Tutti i backend accettano il percorso di un file audio oppure un array NumPy
+float32 mono a 16 kHz.
+"""
+
+from abc import ABC, abstractmethod
+
+
+class STTBackend(ABC):
+    """Interfaccia comune dei backend di speech-to-text."""
+
+    name = "base"
+
+    @abstractmethod
+    def transcribe(self, audio, language: str = None) -> str:
+        """Trascrive un singolo audio e restituisce il testo."""
+
+    def transcribe_batch(self, audios: list, language: str = None) -> list:
+        """
+        Trascrive più audio; restituisce, nell'ordine, il testo oppure l'eccezione
+        che ne ha impedito la trascrizione. Di default li trascrive uno alla volta.
+        """
+        results = []
+        for audio in audios:
+            try:
+                results.append(self.transcribe(audio, language=language))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+class WhisperBackend(STTBackend):
+    name = "whisper"
+
+    def __init__(self, model_name: str = "base"):
+        import whisper
+
+        self._whisper = whisper
+        self.model = whisper.load_model(model_name)
+        self._fp16 = self.model.device.type == "cuda"
+
+    def transcribe(self, audio, language: str = None) -> str:
+        result = self.model.transcribe(audio, language=language, fp16=self._fp16)
+        return result["text"]
+
+    def transcribe_batch(self, audios: list, language: str = None) -> list:
+        """
+        Trascrive più audio con un'unica forward pass di Whisper.
+        Ogni audio viene diviso in segmenti da 30 secondi (l'ultimo completato con silenzio),
+        i segmenti di tutti gli audio vengono decodificati insieme e poi ricomposti per audio.
+        """
+        import torch
+        from whisper.audio import N_SAMPLES
+
+        whisper = self._whisper
+        results = [None] * len(audios)
+        segments, owners = [], []
+
+        for i, audio in enumerate(audios):
+            try:
+                samples = whisper.load_audio(audio) if isinstance(audio, str) else audio
+            except Exception as e:
+                print(f"Errore durante la lettura di {audio}: {e}")
+                results[i] = e
+                continue
+            for start in range(0, max(len(samples), 1), N_SAMPLES):
+                chunk = whisper.pad_or_trim(samples[start:start + N_SAMPLES])
+                segments.append(whisper.log_mel_spectrogram(chunk, self.model.dims.n_mels))
+                owners.append(i)
+
+        if not segments:
+            return results
+
+        print(f"Trascrizione batch: {len(audios)} audio, {len(segments)} segmenti")
+        mel = torch.stack(segments).to(self.model.device)
+        options = whisper.DecodingOptions(language=language, without_timestamps=True, fp16=self._fp16)
+        decoded = whisper.decode(self.model, mel, options)
+
+        texts = {}
+        for owner, result in zip(owners, decoded):
+            texts.setdefault(owner, []).append(result.text.strip())
+        for owner, parts in texts.items():
+            results[owner] = " ".join(p for p in parts if p)
+
+        return results
+
+
+class FasterWhisperBackend(STTBackend):
+    name = "faster-whisper"
+
+    def __init__(self, model_name: str = "base", compute_type: str = "int8", cpu_threads: int = 0):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise ImportError(
+                "STT_BACKEND=faster-whisper richiede il pacchetto faster-whisper (pip install faster-whisper)"
+            ) from e
+
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+    def transcribe(self, audio, language: str = None) -> str:
+        segments, _ = self.model.transcribe(audio, language=language)
+        return " ".join(segment.text.strip() for segment in segments)
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def load_backend(name: str, model_name: str = "base", **options) -> STTBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Backend STT sconosciuto '{name}', disponibili: {', '.join(BACKENDS)}")
+    return BACKENDS[name](model_name, **options)
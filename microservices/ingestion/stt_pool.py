@@ -0,0 +1,222 @@
+import asyncio
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from ingest_ops import transcribe_audio_file, transcribe_audio_batch
+
+"""
+Pool di worker per la trascrizione.
+
+stt_model.transcribe è bloccante e dura anche diversi secondi: eseguirlo
+direttamente nell'handler async bloccherebbe l'event loop di uvicorn (e quindi
+anche le richieste testuali e l'health check). Le trascrizioni vengono quindi
+eseguite in un ThreadPoolExecutor di dimensione configurabile, con una coda
+di attesa limitata: oltre il limite la richiesta viene rifiutata subito.
+
+Con batch_size > 1 il pool lavora a micro-batch: gli audio che arrivano entro
+batch_wait_ms vengono raccolti (fino a batch_size) e trascritti con un'unica
+forward pass del modello; ogni risultato torna poi alla richiesta che lo attende.
+"""
+
+
+class TranscriptionQueueFull(Exception):
+    """Coda delle trascrizioni piena."""
+    pass
+
+
+class TranscriptionPool:
+    def __init__(
+        self,
+        stt_model,
+        workers: int = 1,
+        queue_size: int = 4,
+        batch_size: int = 1,
+        batch_wait_ms: float = 50,
+        language: str = None,
+    ):
+        self._model = stt_model
+        self._workers = workers
+        self._queue_size = queue_size
+        self._batch_size = max(1, batch_size)
+        self._batch_wait = batch_wait_ms / 1000
+        self._language = language
+        self._capacity = workers * self._batch_size  # job che possono essere in esecuzione contemporaneamente
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stt")
+        self._batch_queue = None
+        self._dispatcher = None
+        self._pending = 0                   # job ammessi: in esecuzione + in coda (liberati solo a lavoro finito)
+        self._waiters = deque()             # richieste con wait=True in attesa di un posto libero
+        self._wait_ms = deque(maxlen=200)   # ultime attese in coda
+        self._run_ms = deque(maxlen=200)    # ultime durate di trascrizione (per batch se batching attivo)
+        self._batch_sizes = deque(maxlen=200)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def batching(self) -> bool:
+        return self._batch_size > 1
+
+    def start(self):
+        """Avvia il dispatcher dei micro-batch (da chiamare nel lifespan)."""
+        if self.batching and self._dispatcher is None:
+            self._batch_queue = asyncio.Queue()
+            self._dispatcher = asyncio.get_running_loop().create_task(self._dispatch())
+
+    def _release(self):
+        self._pending -= 1
+        self._wake_next()
+
+    def _wake_next(self):
+        # il posto liberato va alla prima richiesta in attesa ancora viva
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+
+    def _run(self, audio, admitted_at: float) -> str:
+        started = time.perf_counter()
+        self._wait_ms.append(1000 * (started - admitted_at))
+        try:
+            return transcribe_audio_file(self._model, audio, self._language)
+        finally:
+            self._run_ms.append(1000 * (time.perf_counter() - started))
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self._workers)
+
+        while True:
+            # si aspetta un worker libero prima di comporre il batch: mentre i worker
+            # sono occupati la coda si riempie e il batch successivo sarà più grande
+            await slots.acquire()
+            batch = [await self._batch_queue.get()]
+            deadline = loop.time() + self._batch_wait
+            while len(batch) < self._batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._batch_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            task = loop.create_task(self._run_batch(batch))
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _run_batch(self, batch: list):
+        # richieste annullate mentre erano in coda: non serve trascriverle
+        for _, future, _ in batch:
+            if future.done():
+                self._release()
+        batch = [job for job in batch if not job[1].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        for _, _, admitted_at in batch:
+            self._wait_ms.append(1000 * (started - admitted_at))
+        self._batch_sizes.append(len(batch))
+
+        audios = [audio for audio, _, _ in batch]
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(
+                self._executor, transcribe_audio_batch, self._model, audios, self._language
+            )
+        except Exception as e:
+            results = [e] * len(batch)
+        finally:
+            self._run_ms.append(1000 * (time.perf_counter() - started))
+            for _ in batch:
+                self._release()
+
+        for (_, future, _), result in zip(batch, results):
+            if future.done():  # richiesta annullata nel frattempo
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def transcribe(self, audio, wait: bool = False) -> str:
+        """
+        Trascrive l'audio (byte dell'upload o percorso) in un worker del pool senza bloccare l'event loop.
+        Se worker e coda sono tutti occupati solleva TranscriptionQueueFull, oppure con
+        wait=True aspetta che si liberi un posto (usato dai segmenti delle registrazioni in streaming).
+        """
+        while self._pending >= self._capacity + self._queue_size:
+            if not wait:
+                self.rejected += 1
+                raise TranscriptionQueueFull()
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # svegliata ma annullata prima di prendere il posto: lo passa alla successiva
+                    self._wake_next()
+                raise
+
+        # il posto si libera quando il lavoro è davvero finito (nel dispatcher o nel thread del
+        # worker), non quando l'attesa viene annullata: una richiesta annullata mentre il modello
+        # sta trascrivendo occupa ancora il worker e deve continuare a contare
+        self._pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            if self.batching:
+                future = loop.create_future()
+                self._batch_queue.put_nowait((audio, future, time.perf_counter()))
+            else:
+                job = self._executor.submit(self._run, audio, time.perf_counter())
+                job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+                future = asyncio.wrap_future(job, loop=loop)
+        except Exception:
+            self._release()
+            raise
+
+        try:
+            text = await future
+            self.completed += 1
+            return text
+        except Exception:
+            self.failed += 1
+            raise
+
+    def stats(self) -> dict:
+        def summary(values):
+            if not values:
+                return {"avg_ms": 0.0, "p95_ms": 0.0}
+            ordered = sorted(values)
+            return {
+                "avg_ms": round(sum(ordered) / len(ordered), 1),
+                "p95_ms": round(ordered[math.ceil(0.95 * len(ordered)) - 1], 1),
+            }
+
+        batch_sizes = list(self._batch_sizes)
+        return {
+            "workers": self._workers,
+            "queue_size": self._queue_size,
+            "batch_size": self._batch_size,
+            "in_flight": min(self._pending, self._capacity),
+            "queue_depth": max(0, self._pending - self._capacity),
+            "waiting": sum(1 for waiter in self._waiters if not waiter.done()),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_batch": round(sum(batch_sizes) / len(batch_sizes), 2) if batch_sizes else 0.0,
+            "wait": summary(list(self._wait_ms)),
+            "run": summary(list(self._run_ms)),
+        }
+
+    async def shutdown(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=True)
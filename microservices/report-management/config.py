@@ -1,9 +1,49 @@
 from dotenv import load_dotenv
 import os
+from http_client import settings_from_env
 
 load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "healthgate_db")
+MONGO_TLS = os.getenv("MONGO_TLS", "true").lower() == "true"   # false per un mongod locale senza TLS
+# Pool di connessioni del client Motor
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000))
 
 SERVICE_URL = os.getenv("SERVICE_URL") 
-ROUTE = os.getenv("ROUTE") 
\ No newline at end of file
+ROUTE = os.getenv("ROUTE") 
+
+# Webhook da chiamare quando un report viene creato o modificato (separati da virgola, vuoto = nessuno),
+# es. http://aggregator:8005/aggregator/events
+REPORT_EVENTS_WEBHOOKS = [url.strip() for url in os.getenv("REPORT_EVENTS_WEBHOOKS", "").split(",") if url.strip()]
+
+# Cache dei PDF generati: numero di PDF in memoria. Di default la cache è solo in memoria;
+# PDF_CACHE_DIR attiva la copia su disco (es. /var/cache/report-management/pdf su un volume del solo
+# servizio): i PDF contengono dati personali in chiaro, quindi i file vengono cancellati
+# PDF_CACHE_DISK_MAX_AGE secondi dopo la scrittura e al più PDF_CACHE_DISK_SIZE restano su disco
+PDF_CACHE_SIZE = int(os.getenv("PDF_CACHE_SIZE", 128))
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR") or None
+PDF_CACHE_DISK_SIZE = int(os.getenv("PDF_CACHE_DISK_SIZE", 1000))
+PDF_CACHE_DISK_MAX_AGE = float(os.getenv("PDF_CACHE_DISK_MAX_AGE", 86400))
+
+# Pool di processi per la generazione dei PDF: processi (default = numero di core),
+# PDF in attesa oltre quelli in generazione, secondi suggeriti nel Retry-After
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", 0)) or os.cpu_count() or 1
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", 16))
+PDF_RETRY_AFTER = int(os.getenv("PDF_RETRY_AFTER", 5))
+
+# Numero massimo di report in un singolo export ZIP e PDF di un export in generazione o pronti
+# ma non ancora inviati (default = il doppio dei processi): limita la memoria con un client lento
+EXPORT_MAX_REPORTS = int(os.getenv("EXPORT_MAX_REPORTS", 500))
+EXPORT_WINDOW = int(os.getenv("EXPORT_WINDOW", 0)) or 2 * PDF_WORKERS
+
+# Client verso auth (variabili AUTH_SERVICE_*, vedi http_client.py) e cache dell'anagrafica:
+# durata in secondi, numero massimo di pazienti, richieste contemporanee nei caricamenti multipli
+AUTH_CLIENT_SETTINGS = settings_from_env("AUTH_SERVICE", read_timeout=5.0)
+ANAGRAFICA_CACHE_TTL = float(os.getenv("ANAGRAFICA_CACHE_TTL", 600))
+ANAGRAFICA_CACHE_SIZE = int(os.getenv("ANAGRAFICA_CACHE_SIZE", 1000))
+AUTH_MAX_CONCURRENCY = int(os.getenv("AUTH_MAX_CONCURRENCY", 10))
+# Endpoint batch dei profili di auth e pazienti per chiamata (al massimo PROFILE_BATCH_MAX di auth)
+AUTH_BATCH_ROUTE = os.getenv("AUTH_BATCH_ROUTE", "/user/profiles")
+AUTH_BATCH_SIZE = int(os.getenv("AUTH_BATCH_SIZE", 500))
@@ -1,21 +1,33 @@
 import certifi
 from fastapi import HTTPException
-from pymongo.mongo_client import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.server_api import ServerApi
-from config import MONGO_DB_NAME, MONGO_URI
+from config import MONGO_DB_NAME, MONGO_URI, MONGO_TLS, MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS
 from datetime import datetime
 from bson import ObjectId
-
-async def connect_db(): 
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    """
+    Client Motor condiviso da tutto il servizio: va creato una volta nel lifespan
+    e chiuso allo shutdown. Il pool di connessioni è configurabile da variabili d'ambiente.
+    """
+    options = {"tlsCAFile": certifi.where()} if MONGO_TLS else {}
+    return AsyncIOMotorClient(
+        MONGO_URI,
+        server_api=ServerApi('1'),
+        tls=MONGO_TLS,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+        **options,
+    )
+
+
+async def connect_db(client: AsyncIOMotorClient): 
     try:
-        client = MongoClient(
-            MONGO_URI,
-            server_api=ServerApi('1'),
-            tls=True,
-            tlsAllowInvalidCertificates=False,
-            tlsCAFile=certifi.where()
-        )
-        client.admin.command('ping')
+        await client.admin.command('ping')
         print("Connessione a MongoDB Atlas riuscita!")
 
 
@@ -29,21 +41,83 @@ async def connect_db():
 
     
 
+# Indici della collection reports: le ricerche per paziente (id o codice fiscale) usano
+# l'indice anche per l'ordinamento per data, created_at serve agli elenchi per data di inserimento
+REPORT_INDEXES = [
+    IndexModel([("patient_id", ASCENDING), ("date", ASCENDING)], name="patient_id_date"),
+    IndexModel([("social_sec_number", ASCENDING), ("date", ASCENDING)], name="social_sec_number_date"),
+    IndexModel([("created_at", DESCENDING)], name="created_at"),
+]
+
+
+async def ensure_indexes(db):
+    """Crea gli indici mancanti all'avvio (create_indexes non fa nulla per quelli già esistenti)."""
+    names = await db['reports'].create_indexes(REPORT_INDEXES)
+    print("Indici reports:", ", ".join(names))
+
+
 # ----------------------------------------------------------
 # FUNZIONI
 # ----------------------------------------------------------
 
-async def get_reports(collection):
-    return list(collection.find())
+# campi selezionabili con il parametro fields di GET /reports ("id" è sempre incluso)
+REPORT_FIELDS = ("patient_id", "social_sec_number", "date", "sintomi", "motivazione", "diagnosi", "trattamento", "created_at")
+
+
+def report_filter(patient_id: int = None, social_sec_number: str = None,
+                  date_from: str = None, date_to: str = None) -> dict:
+    """Filtro Mongo per paziente (id o codice fiscale) e intervallo di date (estremi inclusi)."""
+    query = {}
+    if patient_id is not None:
+        query["patient_id"] = patient_id
+    if social_sec_number:
+        query["social_sec_number"] = social_sec_number
+    if date_from or date_to:
+        query["date"] = {}
+        if date_from:
+            query["date"]["$gte"] = date_from
+        if date_to:
+            query["date"]["$lte"] = date_to
+    return query
+
+
+async def get_reports_for_export(collection, limit: int, **filters):
+    """Report completi che rispettano i filtri, in ordine di data (al massimo limit)."""
+    query = report_filter(**filters)
+    return await collection.find(query).sort("date", 1).limit(limit).to_list(length=None)
+
+
+async def get_reports_page(collection, limit: int, after_id: str = None, patient_id: int = None,
+                           social_sec_number: str = None, date_from: str = None, date_to: str = None,
+                           fields: list = None):
+    """
+    Una pagina di report, dal più recente, con paginazione keyset su _id: la pagina successiva
+    si chiede passando come after_id l'ultimo id ricevuto, senza skip sull'intera collection.
+    Restituisce (report, id da usare per la pagina successiva oppure None se è l'ultima).
+    """
+    query = report_filter(patient_id, social_sec_number, date_from, date_to)
+    if after_id:
+        query["_id"] = {"$lt": ObjectId(after_id)}
+
+    projection = {field: 1 for field in fields} if fields else None
+
+    # un elemento in più per sapere se esiste una pagina successiva
+    reports = await collection.find(query, projection).sort("_id", -1).limit(limit + 1).to_list(length=None)
+    has_more = len(reports) > limit
+    reports = reports[:limit]
+    for r in reports:
+        r["id"] = str(r.pop("_id"))
+    next_after_id = reports[-1]["id"] if has_more else None
+    return reports, next_after_id
 
 
 async def get_report_by_id(collection, report_id: str):
     oid = ObjectId(report_id)
-    return collection.find_one({"_id": oid})
+    return await collection.find_one({"_id": oid})
 
 async def get_reports_by_patient_id(collection, patient_id: int):
     """Restituisce tutti i report clinici di un paziente ordinati per data."""
-    l = list(collection.find({"patient_id": patient_id}).sort("data", 1))
+    l = await collection.find({"patient_id": patient_id}).sort("date", 1).to_list(length=None)
     for r in l:
         if "_id" in r and isinstance(r["_id"], ObjectId):
             r["id"] = str(r["_id"])
@@ -52,21 +126,57 @@ async def get_reports_by_patient_id(collection, patient_id: int):
 
 async def get_reports_by_patient_ssn(collection, social_sec_number : str):
     """Restituisce tutti i report clinici di un paziente ordinati per data."""
-    l = list(collection.find({"social_sec_number": social_sec_number}).sort("data", 1))
+    l = await collection.find({"social_sec_number": social_sec_number}).sort("date", 1).to_list(length=None)
     for r in l:
         if "_id" in r and isinstance(r["_id"], ObjectId):
             r["id"] = str(r["_id"])
     print(l)
     return l
 
+# campi dei report usati come contesto clinico dal decision engine
+CONTEXT_FIELDS = ("date", "sintomi", "motivazione", "diagnosi", "trattamento")
+
+
+async def get_report_context(collection, patient_id: int, limit: int, summary: bool = False):
+    """
+    Restituisce solo gli ultimi `limit` report del paziente (in ordine cronologico) con i soli
+    campi del contesto clinico. Con summary=True aggiunge un riepilogo dei report più vecchi.
+    """
+    projection = {"_id": 0, **{field: 1 for field in CONTEXT_FIELDS}}
+    recent = await collection.find({"patient_id": patient_id}, projection).sort("date", -1).limit(limit).to_list(length=None)
+    recent.reverse()
+
+    context = {"reports": recent, "older": None}
+    if summary and len(recent) == limit:
+        pipeline = [
+            {"$match": {"patient_id": patient_id}},
+            {"$sort": {"date": -1}},
+            {"$skip": limit},
+            {"$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "first_date": {"$min": "$date"},
+                "last_date": {"$max": "$date"},
+                "diagnosi": {"$addToSet": "$diagnosi"},
+            }},
+        ]
+        older = await collection.aggregate(pipeline).to_list(length=1)
+        if older:
+            older = older[0]
+            older.pop("_id")
+            older["diagnosi"] = sorted(d for d in older["diagnosi"] if d)
+            context["older"] = older
+    return context
+
+
 async def modify_report(collection, report_id:str, diagnosi:str, trattamento:str):
     oid = ObjectId(report_id)
-    result = collection.update_one({"_id": oid}, {"$set": {"diagnosi": diagnosi, "trattamento": trattamento}})
+    result = await collection.update_one({"_id": oid}, {"$set": {"diagnosi": diagnosi, "trattamento": trattamento}})
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Report non trovato")
 
-    return collection.find_one({"_id": oid})
+    return await collection.find_one({"_id": oid})
     
 
 async def save_report(collection, report_data: dict):
@@ -80,7 +190,7 @@ async def save_report(collection, report_data: dict):
     report_data["created_at"] = datetime.now().isoformat()
     
     # Inserisci il documento e ottieni il risultato
-    result = collection.insert_one(report_data)
+    result = await collection.insert_one(report_data)
     
     # Restituisci l'ID del documento inserito come stringa
     return str(result.inserted_id)
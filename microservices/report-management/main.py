@@ -1,20 +1,50 @@
 # python -m uvicorn main:app --reload --host 0.0.0.0 --port 8005
 
-from fastapi import FastAPI
-from typing import List
+import asyncio
+import itertools
+import re
+from fastapi import FastAPI, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 from database import * 
 from contextlib import asynccontextmanager
-from pdf_gen import genera_pdf
+from pdf_pool import PdfRenderPool, PdfRenderQueueFull
+from pdf_cache import PdfCache, pdf_version
+from zip_stream import ZipStreamWriter
 from validation import *
-from report_ops import get_anagrafica
+from report_ops import AuthClient, PatientNotFound
+from http_client import pool_metrics
+from notifications import ReportEventNotifier
+from config import REPORT_EVENTS_WEBHOOKS, PDF_CACHE_SIZE, PDF_CACHE_DIR, PDF_CACHE_DISK_SIZE, PDF_CACHE_DISK_MAX_AGE
+from config import PDF_WORKERS, PDF_QUEUE_SIZE, PDF_RETRY_AFTER, EXPORT_MAX_REPORTS, EXPORT_WINDOW
+from config import SERVICE_URL, ROUTE, AUTH_CLIENT_SETTINGS, ANAGRAFICA_CACHE_TTL, ANAGRAFICA_CACHE_SIZE, AUTH_MAX_CONCURRENCY
+from config import AUTH_BATCH_ROUTE, AUTH_BATCH_SIZE
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Inizializza connessioni al database
-    global db
-    db = await connect_db()
+    global mongo_client, db, notifier, auth_client, pdf_cache, pdf_pool, export_slots
+    mongo_client = create_mongo_client()
+    db = await connect_db(mongo_client)
     print("Connessione a MongoDB stabilita")
+    if db is not None:
+        await ensure_indexes(db)
+    notifier = ReportEventNotifier(REPORT_EVENTS_WEBHOOKS)
+    auth_client = AuthClient(
+        SERVICE_URL or "", ROUTE or "", AUTH_CLIENT_SETTINGS,
+        ANAGRAFICA_CACHE_TTL, ANAGRAFICA_CACHE_SIZE, AUTH_MAX_CONCURRENCY,
+        AUTH_BATCH_ROUTE, AUTH_BATCH_SIZE,
+    )
+    pdf_cache = PdfCache(PDF_CACHE_SIZE, PDF_CACHE_DIR, PDF_CACHE_DISK_SIZE, PDF_CACHE_DISK_MAX_AGE)
+    await asyncio.to_thread(pdf_cache.load_disk)
+    pdf_pool = PdfRenderPool(PDF_WORKERS, PDF_QUEUE_SIZE)
+    # gli export usano al massimo un PDF in generazione per processo: la coda resta libera per i download singoli
+    export_slots = asyncio.Semaphore(PDF_WORKERS)
     yield
+    pdf_pool.shutdown()
+    await notifier.close()
+    await auth_client.close()
+    mongo_client.close()
     print("Report Management Service terminato")
 
 app = FastAPI(title="Report Management Service", lifespan=lifespan)
@@ -22,17 +52,89 @@ app = FastAPI(title="Report Management Service", lifespan=lifespan)
 
 # ================== ROUTES ==================
 
+
+def etag_matches(if_none_match: Optional[str], version: str) -> bool:
+    """If-None-Match (RFC 9110): "*" o un elenco di tag separati da virgola, confrontati in modo debole."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == f'"{version}"':
+            return True
+    return False
+
+
+def check_date_filter(date_from: Optional[str], date_to: Optional[str]):
+    """Le date sono confrontate come stringhe nel database: devono essere date valide nel formato YYYY-MM-DD."""
+    for name, value in (("date_from", date_from), ("date_to", date_to)):
+        if value is None:
+            continue
+        try:
+            if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+                raise ValueError
+            datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{name} non valida, formato atteso YYYY-MM-DD")
+    if date_from and date_to and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from successiva a date_to")
+
 @app.get("/", response_model=dict)
 async def health():
     return {"Status": "T'appost! Report Management Service running"}
 
 
-## ROUTE PER RICAVARE TUTTI I REPORT
-@app.get("/reports", response_model=List[Report])
-async def find_all_reports():
+@app.get("/metrics")
+async def metrics():
+    return {
+        "pdf_cache": pdf_cache.stats(),
+        "pdf_render": pdf_pool.stats(),
+        "anagrafica_cache": auth_client.stats(),
+        "pool_wait": pool_metrics.stats(),
+    }
+
+
+## ROUTE PER RICAVARE I REPORT (PAGINATI)
+@app.get("/reports", response_model=ReportPage)
+async def find_all_reports(
+    limit: int = Query(50, ge=1, le=500),
+    after_id: Optional[str] = None,
+    patient_id: Optional[int] = None,
+    social_sec_number: Optional[str] = None,
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD, incluso"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD, incluso"),
+    fields: Optional[str] = Query(None, description="campi separati da virgola, es. date,sintomi"),
+    with_patient: bool = Query(False, description="aggiunge firstname e lastname del paziente"),
+):
+    """
+    Report dal più recente, una pagina alla volta: per la pagina successiva
+    passare after_id = next_after_id della risposta precedente
+    """
+    if after_id is not None and not ObjectId.is_valid(after_id):
+        raise HTTPException(status_code=400, detail="after_id non valido")
+    check_date_filter(date_from, date_to)
+
+    selected = None
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(selected) - set(REPORT_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campi non validi: {', '.join(sorted(unknown))}")
+        if with_patient and "patient_id" not in selected:
+            selected.append("patient_id")
+
     collection = db['reports']
-    reports = await get_reports(collection)
-    return reports
+    reports, next_after_id = await get_reports_page(
+        collection, limit, after_id, patient_id, social_sec_number, date_from, date_to, selected
+    )
+    if with_patient:
+        # una sola richiesta batch ad auth per i pazienti della pagina non già in cache
+        anagrafiche = await auth_client.get_anagrafiche(r["patient_id"] for r in reports if "patient_id" in r)
+        for r in reports:
+            anagrafica = anagrafiche.get(r.get("patient_id"))
+            if isinstance(anagrafica, dict):
+                r["firstname"] = anagrafica["firstname"]
+                r["lastname"] = anagrafica["lastname"]
+    return ReportPage(items=reports, next_after_id=next_after_id)
         
 
 ## ROUTE PER CREARE UN REPORT
@@ -58,6 +160,7 @@ async def create_report(data: CreateReportRequest):
     report_id = await save_report(collection, report_data)
     
     print(f"✅ Report creato con ID: {report_id}")
+    notifier.notify("report.created", data.patient_id)
     return CreateReportResponse(success=True, report_id=report_id)
 
 
@@ -79,6 +182,19 @@ async def find_report_by_patient_id(patient_id: int):
 
 
 
+## ROUTE PER IL CONTESTO CLINICO DI UN PAZIENTE (USATA DALL'AGGREGATOR)
+
+@app.get("/reports/context/{patient_id}", response_model=ReportContext)
+async def find_report_context(patient_id: int, limit: int = Query(5, ge=1, le=50), summary: bool = False):
+    """
+    Ultimi `limit` report del paziente con i soli campi clinici e,
+    con summary=true, il riepilogo dei report precedenti
+    """
+    collection = db['reports']
+    return await get_report_context(collection, patient_id, limit, summary)
+
+
+
 @app.get("/reports/ssn/{social_sec_number}", response_model=List[Report])
 async def find_report_by_patient_ssn(social_sec_number: str):
     """
@@ -102,16 +218,132 @@ async def find_report_by_id(report_id: str):
 @app.put("/report/{report_id}", response_model=Report)
 async def update_report(data: UpdateRequest):
     collection = db['reports']
-    return await modify_report(collection, data.report_id, data.diagnosi, data.trattamento)
+    report = await modify_report(collection, data.report_id, data.diagnosi, data.trattamento)
+    await pdf_cache.invalidate(data.report_id)
+    notifier.notify("report.updated", report["patient_id"])
+    return report
 
     
+async def get_or_render_pdf(report_id: str, version: str, dati: dict) -> bytes:
+    """PDF dalla cache oppure generato nel pool di processi (solleva PdfRenderQueueFull se il pool è pieno)."""
+    pdf = await pdf_cache.get(report_id, version)
+    if pdf is None:
+        # xhtml2pdf impegna la CPU: la generazione gira nel pool di processi
+        pdf = await pdf_pool.render(dati)
+        await pdf_cache.put(report_id, version, pdf)
+    return pdf
+
+
 ## ROUTE PER GENERARE UN PDF 
 @app.get("/report/pdf/{report_id}")
-async def pdf_from_report(report_id: str):
+async def pdf_from_report(report_id: str, request: Request):
     collection = db['reports']
     report = await get_report_by_id(collection, report_id)
-    anagrafica = await get_anagrafica(report)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report non trovato")
+    try:
+        anagrafica = await auth_client.get_anagrafica(report["patient_id"])
+    except PatientNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     dati_completi = {**anagrafica, **report}
-    return genera_pdf(dati_completi, report_id)
 
+    # la versione dipende da tutti i dati del PDF: se non è cambiata il client può tenere la sua copia
+    version = pdf_version(dati_completi)
+    headers = {
+        "ETag": f'"{version}"',
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": f'attachment; filename="report_{report_id}.pdf"',
+    }
+    if etag_matches(request.headers.get("if-none-match"), version):
+        return Response(status_code=304, headers={"ETag": headers["ETag"], "Cache-Control": headers["Cache-Control"]})
+
+    try:
+        pdf = await get_or_render_pdf(report_id, version, dati_completi)
+    except PdfRenderQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Troppi PDF in generazione, riprovare più tardi.",
+            headers={"Retry-After": str(PDF_RETRY_AFTER)},
+        )
+
+    return Response(content=pdf, media_type="application/pdf", headers=headers)
+
+
+
+## ROUTE PER ESPORTARE PIÙ REPORT IN UN UNICO ZIP
+@app.get("/reports/export")
+async def export_reports(
+    patient_id: Optional[int] = None,
+    social_sec_number: Optional[str] = None,
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD, incluso"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD, incluso"),
+):
+    """
+    Genera i PDF dei report di un paziente e/o di un intervallo di date e li restituisce
+    in un archivio ZIP inviato in streaming: ogni PDF viene aggiunto appena è pronto.
+    """
+    # i parametri vuoti (?social_sec_number=) valgono come assenti: senza filtri si esporterebbero report di chiunque
+    social_sec_number, date_from, date_to = (value.strip() or None if value is not None else None
+                                             for value in (social_sec_number, date_from, date_to))
+    filters = {"patient_id": patient_id, "social_sec_number": social_sec_number, "date_from": date_from, "date_to": date_to}
+    if all(value is None for value in filters.values()):
+        raise HTTPException(status_code=400, detail="Indicare un paziente o un intervallo di date")
+    check_date_filter(date_from, date_to)
+
+    collection = db['reports']
+    reports = await get_reports_for_export(collection, EXPORT_MAX_REPORTS, **filters)
+    if not reports:
+        raise HTTPException(status_code=404, detail="Nessun report trovato")
+
+    # anagrafica richiesta ad auth una sola volta per paziente, non per ogni report
+    anagrafiche = await auth_client.get_anagrafiche(r["patient_id"] for r in reports)
+
+    async def render(report):
+        report_id = str(report["_id"])
+        try:
+            anagrafica = anagrafiche[report["patient_id"]]
+            if isinstance(anagrafica, Exception):
+                raise anagrafica
+            dati = {**anagrafica, **report}
+            async with export_slots:
+                pdf = await get_or_render_pdf(report_id, pdf_version(dati), dati)
+            filename = f"{report.get('date', '')}_{anagrafica['lastname']}_{report_id}.pdf"
+            return filename, pdf, None
+        except Exception as e:
+            return None, None, f"{report_id}: {e}"
+
+    async def zip_chunks():
+        writer = ZipStreamWriter()
+        remaining = iter(reports)
+        tasks = set()
+        errors = []
+        try:
+            while True:
+                # al massimo EXPORT_WINDOW PDF in memoria: un nuovo report parte solo quando uno è stato inviato,
+                # così con un client lento la generazione si ferma invece di accumulare tutto l'export
+                for report in itertools.islice(remaining, EXPORT_WINDOW - len(tasks)):
+                    tasks.add(asyncio.create_task(render(report)))
+                if not tasks:
+                    break
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    filename, pdf, error = task.result()
+                    if error is not None:
+                        errors.append(error)
+                        continue
+                    yield writer.add(filename, pdf)
+            if errors:
+                print(f"Export: {len(errors)} report non generati")
+                yield writer.add("errori.txt", "\n".join(errors).encode("utf-8"))
+            yield writer.close()
+        finally:
+            # client disconnesso: si interrompe la generazione dei PDF rimanenti
+            for task in tasks:
+                task.cancel()
 
+    print(f"Export di {len(reports)} report ({len(anagrafiche)} pazienti)")
+    return StreamingResponse(
+        zip_chunks(),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="reports_export.zip"'},
+    )
@@ -0,0 +1,41 @@
+import asyncio
+import httpx
+
+"""
+Notifiche di modifica dei report verso gli altri servizi (webhook).
+
+L'aggregator tiene in cache lo storico dei report dei pazienti: quando un report
+viene creato o aggiornato gli si invia un evento per invalidare la cache di quel
+paziente. L'invio avviene in background e un errore non blocca la richiesta:
+in caso di notifica persa la cache dell'aggregator scade comunque dopo il TTL.
+"""
+
+
+class ReportEventNotifier:
+    def __init__(self, urls: list, timeout: float = 2.0):
+        self.urls = urls
+        self.client = httpx.AsyncClient(timeout=timeout) if urls else None
+        self._tasks = set()
+
+    async def _send(self, url: str, payload: dict):
+        try:
+            resp = await self.client.post(url, json=payload)
+            resp.raise_for_status()
+        except Exception as e:
+            print(f"Notifica {payload['event']} a {url} non riuscita: {e}")
+
+    def notify(self, event: str, patient_id: int):
+        if not self.urls:
+            return
+        payload = {"event": event, "patient_id": patient_id}
+        for url in self.urls:
+            task = asyncio.create_task(self._send(url, payload))
+            # riferimento ai task in corso, altrimenti potrebbero essere raccolti dal garbage collector
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def close(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.client is not None:
+            await self.client.aclose()
@@ -0,0 +1,178 @@
+from collections import OrderedDict
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+"""
+Cache dei PDF già generati.
+
+Ogni PDF è identificato dall'id del report e da una versione, l'hash dei dati
+usati per generarlo (campi del report + anagrafica): se i dati cambiano cambia la
+versione e il PDF viene rigenerato. La versione è usata anche come ETag.
+I PDF stanno in un LRU in memoria e, solo se configurata, in una cartella su disco
+che sopravvive ai riavvii; modify_report invalida entrambi i livelli.
+
+I PDF contengono dati anagrafici e clinici in chiaro: la cartella su disco va
+montata su un volume non condiviso e ogni file viene cancellato al più tardi
+disk_max_age secondi dopo la scrittura, anche se nel frattempo è stato letto.
+L'elenco dei file su disco è tenuto in memoria (ricostruito all'avvio con
+load_disk), così le richieste non scandiscono la cartella; letture, scritture e
+cancellazioni girano in un thread per non bloccare l'event loop.
+"""
+
+
+def pdf_version(dati: dict) -> str:
+    payload = json.dumps(dati, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+class PdfCache:
+    def __init__(self, max_items: int = 128, disk_dir: str = None, disk_max_files: int = 1000,
+                 disk_max_age: float = 86400):
+        self._max_items = max_items
+        self._disk_dir = disk_dir
+        self._disk_max_files = disk_max_files
+        self._disk_max_age = disk_max_age
+        self._entries = OrderedDict()      # report_id -> (versione, pdf)
+        self._disk_files = OrderedDict()   # report_id -> (versione, istante di scrittura), dal meno usato
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, report_id: str, version: str) -> str:
+        return os.path.join(self._disk_dir, f"{report_id}-{version}.pdf")
+
+    def load_disk(self):
+        """Ricostruisce l'elenco dei file su disco, cancellando quelli scaduti o in eccesso (da chiamare all'avvio)."""
+        if not self._disk_dir:
+            return
+        os.makedirs(self._disk_dir, exist_ok=True)
+        now = time.time()
+        found = []
+        for name in os.listdir(self._disk_dir):
+            path = os.path.join(self._disk_dir, name)
+            if not os.path.isfile(path):
+                continue
+            report_id, _, version = name[:-len(".pdf")].rpartition("-")
+            written_at = os.path.getmtime(path)
+            if not name.endswith(".pdf") or not report_id or now - written_at > self._disk_max_age:
+                # file scaduti, temporanei rimasti da un arresto a metà scrittura o estranei alla cache
+                _remove(path)
+                continue
+            found.append((written_at, report_id, version, path))
+        found.sort()
+        stale = []
+        with self._lock:
+            for written_at, report_id, version, path in found:
+                previous = self._disk_files.pop(report_id, None)
+                if previous is not None:
+                    stale.append(self._path(report_id, previous[0]))
+                self._disk_files[report_id] = (version, written_at)
+            stale.extend(self._evict_disk(now))
+        for path in stale:
+            _remove(path)
+        print(f"Cache PDF su disco: {len(self._disk_files)} file in {self._disk_dir}")
+
+    async def get(self, report_id: str, version: str):
+        with self._lock:
+            entry = self._entries.get(report_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(report_id)
+                self.memory_hits += 1
+                return entry[1]
+            on_disk = self._disk_files.get(report_id)
+            if on_disk is not None and on_disk[0] == version and time.time() - on_disk[1] <= self._disk_max_age:
+                self._disk_files.move_to_end(report_id)
+            else:
+                on_disk = None
+
+        if on_disk is not None:
+            pdf = await asyncio.to_thread(_read, self._path(report_id, version))
+            if pdf is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(report_id, version, pdf)
+                return pdf
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    async def put(self, report_id: str, version: str, pdf: bytes):
+        with self._lock:
+            self._remember(report_id, version, pdf)
+            if not self._disk_dir:
+                return
+            previous = self._disk_files.pop(report_id, None)
+            stale = [self._path(report_id, previous[0])] if previous is not None and previous[0] != version else []
+            self._disk_files[report_id] = (version, time.time())
+            stale.extend(self._evict_disk(time.time()))
+        await asyncio.to_thread(_write, self._path(report_id, version), pdf, stale)
+
+    async def invalidate(self, report_id: str):
+        with self._lock:
+            self._entries.pop(report_id, None)
+            on_disk = self._disk_files.pop(report_id, None)
+        if on_disk is not None:
+            await asyncio.to_thread(_remove, self._path(report_id, on_disk[0]))
+
+    def _remember(self, report_id: str, version: str, pdf: bytes):
+        self._entries[report_id] = (version, pdf)
+        self._entries.move_to_end(report_id)
+        while len(self._entries) > self._max_items:
+            self._entries.popitem(last=False)
+
+    def _evict_disk(self, now: float) -> list:
+        """Toglie dall'elenco i file scaduti e quelli oltre disk_max_files; restituisce i percorsi da cancellare."""
+        stale = []
+        for report_id, (version, written_at) in list(self._disk_files.items()):
+            if now - written_at > self._disk_max_age:
+                del self._disk_files[report_id]
+                stale.append(self._path(report_id, version))
+        while len(self._disk_files) > self._disk_max_files:
+            report_id, (version, _) = self._disk_files.popitem(last=False)
+            stale.append(self._path(report_id, version))
+        return stale
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            total = hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_items": self._max_items,
+                "disk": self._disk_dir is not None,
+                "disk_files": len(self._disk_files),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+
+def _read(path: str):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _write(path: str, pdf: bytes, stale: list):
+    # scrittura su file temporaneo e rename, così una lettura concorrente non trova mai un file a metà
+    with open(path + ".tmp", "wb") as f:
+        f.write(pdf)
+    os.replace(path + ".tmp", path)
+    for stale_path in stale:
+        _remove(stale_path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
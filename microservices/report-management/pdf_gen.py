@@ -1,11 +1,22 @@
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse
 from jinja2 import Environment, FileSystemLoader
 from xhtml2pdf import pisa
 import tempfile
+import os
 from io import BytesIO
 
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# ambiente Jinja creato una sola volta per processo: il template viene letto e compilato
+# alla prima richiesta, oppure all'avvio nei processi del pool (init_worker)
+env = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+
+
+def init_worker():
+    env.get_template("scheda.html")
+
+
 def genera_html(dati_json: dict) -> str:
-    env = Environment(loader=FileSystemLoader("templates"))
     template = env.get_template("scheda.html")
     return template.render(dati_json)
 
@@ -17,18 +28,9 @@ def genera_pdf(dati_json, report_id):
         return FileResponse(tmp.name, media_type="application/pdf", filename=f"report_{report_id}.pdf")
 '''
 
-def genera_pdf(dati_json, report_id):
+def genera_pdf_bytes(dati_json) -> bytes:
     html_str = genera_html(dati_json)
-    pdf_bytes = BytesIO()  # crea un buffer in memoria
+    pdf_bytes = BytesIO()
     pisa.CreatePDF(html_str, dest=pdf_bytes)
-    pdf_bytes.seek(0)  # riporta il cursore all'inizio per la lettura
-
-    headers = {
-        "Content-Disposition": f'attachment; filename="report_{report_id}.pdf"'
-    }
+    return pdf_bytes.getvalue()
 
-    return StreamingResponse(
-        pdf_bytes,
-        media_type="application/pdf",
-        headers=headers
-    )
\ No newline at end of file
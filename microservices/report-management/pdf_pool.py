@@ -0,0 +1,90 @@
+import asyncio
+import math
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pdf_gen import init_worker, genera_pdf_bytes
+
+"""
+Pool di processi per la generazione dei PDF.
+
+pisa.CreatePDF è puro Python e impegna la CPU per centinaia di millisecondi:
+in un thread resterebbe comunque serializzato dal GIL. I PDF vengono quindi
+generati in un ProcessPoolExecutor di dimensione configurabile, in cui ogni
+processo compila il template Jinja una sola volta all'avvio. La coda di attesa
+è limitata: oltre il limite la richiesta viene rifiutata subito (503).
+"""
+
+
+class PdfRenderQueueFull(Exception):
+    """Coda di generazione dei PDF piena."""
+    pass
+
+
+class PdfRenderPool:
+    def __init__(self, workers: int = 2, queue_size: int = 16):
+        self._workers = workers
+        self._queue_size = queue_size
+        # spawn invece di fork: il processo del servizio ha già thread attivi (es. quelli del driver Mongo)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+        self._pending = 0                   # PDF ammessi: in generazione + in coda
+        self._render_ms = deque(maxlen=200) # ultime durate, attesa in coda inclusa
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def render(self, dati: dict) -> bytes:
+        """
+        Genera il PDF in un processo del pool senza bloccare l'event loop.
+        Solleva PdfRenderQueueFull se processi e coda sono tutti occupati.
+        """
+        if self._pending >= self._workers + self._queue_size:
+            self.rejected += 1
+            raise PdfRenderQueueFull()
+
+        # il posto si libera quando il processo ha finito (callback del future del pool), non quando
+        # l'attesa viene annullata: un export interrotto lascia il PDF in generazione e deve continuare a contare
+        self._pending += 1
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._executor.submit(genera_pdf_bytes, dati)
+        except Exception:
+            self._release(started)
+            raise
+        job.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release, started))
+
+        try:
+            # se l'attesa viene annullata prima che il PDF parta, wrap_future toglie il lavoro dalla coda
+            pdf = await asyncio.wrap_future(job, loop=loop)
+            self.completed += 1
+            return pdf
+        except Exception:
+            self.failed += 1
+            raise
+
+    def _release(self, started: float):
+        self._pending -= 1
+        self._render_ms.append(1000 * (time.perf_counter() - started))
+
+    def stats(self) -> dict:
+        values = sorted(self._render_ms)
+        return {
+            "workers": self._workers,
+            "queue_size": self._queue_size,
+            "in_flight": min(self._pending, self._workers),
+            "queue_depth": max(0, self._pending - self._workers),
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_ms": round(sum(values) / len(values), 1) if values else 0.0,
+            "p95_ms": round(values[math.ceil(0.95 * len(values)) - 1], 1) if values else 0.0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
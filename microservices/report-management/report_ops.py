@@ -1,39 +1,184 @@
-from config import ROUTE, SERVICE_URL
-from validation import Report
-import httpx
+import asyncio
+import time
+from http_client import create_client
+
+"""
+Client verso il servizio auth per l'anagrafica dei pazienti.
+
+Viene creato una volta nel lifespan e riusa le connessioni del pool httpx.
+L'anagrafica cambia di rado, quindi resta in una piccola cache per patient_id
+con scadenza (TTL): i PDF e gli elenchi dello stesso paziente non richiamano auth.
+Le anagrafiche di più pazienti si chiedono con l'endpoint batch di auth, a blocchi
+di batch_size id per chiamata.
+Per ogni paziente in caricamento c'è un future in _inflight: le richieste
+contemporanee per lo stesso paziente (singole o multiple) aspettano la stessa
+chiamata ad auth invece di farne una ciascuna.
+"""
+
+
+def anagrafica_from_profile(profile: dict) -> dict:
+    """Campi del profilo auth usati nei PDF."""
+    return {
+        "social_sec_number": profile['social_sec_number'],
+        "firstname": profile['firstname'],
+        "lastname": profile['lastname'],
+        "birth_date": profile['birth_date'],
+        "sex": profile['sex'],
+        "birth_place": profile['birth_place'],
+    }
+
+
+class PatientNotFound(LookupError):
+    pass
 
 
 class AuthClient:
-    def __init__(self):
-        self.client = httpx.AsyncClient()
+    def __init__(self, base_url: str, route: str, settings, cache_ttl: float = 600, cache_size: int = 1000,
+                 max_concurrency: int = 10, batch_route: str = "/user/profiles", batch_size: int = 500):
+        self.client = create_client("auth", settings, base_url=base_url)
+        self.route = route
+        self.batch_route = batch_route
+        self.batch_size = batch_size
+        self._ttl = cache_ttl
+        self._max_size = cache_size
+        self._cache = {}    # patient_id -> (anagrafica, scadenza)
+        self._inflight = {}  # patient_id -> future dell'anagrafica in caricamento
+        self._fetches = set()  # task delle chiamate in corso (asyncio tiene solo riferimenti deboli)
+        # richieste contemporanee verso auth durante un caricamento multiplo
+        self._limit = asyncio.Semaphore(max_concurrency)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _cached(self, patient_id: int):
+        entry = self._cache.get(patient_id)
+        if entry is not None:
+            anagrafica, expires_at = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                return anagrafica
+            del self._cache[patient_id]
+        self.misses += 1
+        return None
 
-    async def request(self, param: int):
-        resp = await self.client.get(f"{SERVICE_URL}{ROUTE}/{param}")
+    def _store(self, patient_id: int, anagrafica: dict):
+        if len(self._cache) >= self._max_size and patient_id not in self._cache:
+            # cache piena: si scarta l'entry inserita per prima
+            del self._cache[next(iter(self._cache))]
+        self._cache[patient_id] = (anagrafica, time.monotonic() + self._ttl)
+
+    async def _fetch(self, patient_id: int) -> dict:
+        async with self._limit:
+            resp = await self.client.get(f"{self.route}/{patient_id}")
+        if resp.status_code == 404:
+            # come nel caricamento batch: il paziente non esiste, non è un errore di auth
+            raise PatientNotFound(f"Paziente {patient_id} non trovato")
         resp.raise_for_status()
-        return resp.json()
+        anagrafica = anagrafica_from_profile(resp.json())
+        self._store(patient_id, anagrafica)
+        return {patient_id: anagrafica}
 
+    async def _fetch_batch(self, patient_ids: list) -> dict:
+        async with self._limit:
+            resp = await self.client.post(self.batch_route, json={"ids": patient_ids})
+        resp.raise_for_status()
+        profiles = resp.json()["profiles"]
+        result = {}
+        for patient_id in patient_ids:
+            profile = profiles.get(str(patient_id))
+            if profile is None:
+                result[patient_id] = PatientNotFound(f"Paziente {patient_id} non trovato")
+            else:
+                result[patient_id] = anagrafica_from_profile(profile)
+                self._store(patient_id, result[patient_id])
+        return result
 
-class AuthAdapter:
-    def __init__(self):
-        self.client = AuthClient()
+    def _start(self, patient_ids: list, fetch) -> dict:
+        """
+        Avvia fetch (patient_id -> anagrafica o eccezione) in un task e registra in _inflight
+        un future per ogni paziente, risolto quando il task termina.
+        """
+        loop = asyncio.get_running_loop()
+        futures = {patient_id: loop.create_future() for patient_id in patient_ids}
+        for future in futures.values():
+            # l'errore resta letto anche se chi aspettava è stato cancellato
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight.update(futures)
 
-    async def send(self, input) -> dict:
+        def settle(task: asyncio.Task):
+            if task.cancelled():
+                results = {}
+            elif task.exception() is not None:
+                # chiamata non riuscita: l'errore vale per tutti i suoi pazienti
+                results = dict.fromkeys(futures, task.exception())
+            else:
+                results = task.result()
+            for patient_id, future in futures.items():
+                if self._inflight.get(patient_id) is future:
+                    del self._inflight[patient_id]
+                value = results.get(patient_id)
+                if value is None:
+                    future.cancel()
+                elif isinstance(value, Exception):
+                    future.set_exception(value)
+                else:
+                    future.set_result(value)
 
-        param = input['patient_id']
-        response = await self.client.request(param)
-        return response
+        task = asyncio.create_task(fetch)
+        self._fetches.add(task)
+        task.add_done_callback(self._fetches.discard)
+        task.add_done_callback(settle)
+        return futures
 
+    async def get_anagrafica(self, patient_id: int) -> dict:
+        anagrafica = self._cached(patient_id)
+        if anagrafica is not None:
+            return anagrafica
+        future = self._inflight.get(patient_id)
+        if future is None:
+            future = self._start([patient_id], self._fetch(patient_id))[patient_id]
+        else:
+            self.coalesced += 1
+        # shield: se questo chiamante viene cancellato la chiamata prosegue per gli altri
+        return await asyncio.shield(future)
 
+    async def get_anagrafiche(self, patient_ids) -> dict:
+        """
+        Anagrafica di più pazienti: patient_id -> anagrafica, oppure l'eccezione
+        se per quel paziente la chiamata ad auth non è riuscita.
+        Vengono richiesti ad auth solo i pazienti non in cache e non già in caricamento,
+        con una chiamata batch ogni batch_size pazienti.
+        """
+        result = {}
+        waiting = {}
+        missing = []
+        for patient_id in dict.fromkeys(patient_ids):
+            anagrafica = self._cached(patient_id)
+            if anagrafica is not None:
+                result[patient_id] = anagrafica
+            elif patient_id in self._inflight:
+                waiting[patient_id] = self._inflight[patient_id]
+                self.coalesced += 1
+            else:
+                missing.append(patient_id)
+        for i in range(0, len(missing), self.batch_size):
+            chunk = missing[i:i + self.batch_size]
+            waiting.update(self._start(chunk, self._fetch_batch(chunk)))
+        fetched = await asyncio.gather(*(asyncio.shield(future) for future in waiting.values()), return_exceptions=True)
+        result.update(zip(waiting, fetched))
+        return result
 
-async def get_anagrafica(report: Report): 
-    adapter = AuthAdapter()
-    response = await adapter.send(report)
-    print(response)
-    return {
-        "social_sec_number": response['social_sec_number'],
-        "firstname": response['firstname'],
-        "lastname": response['lastname'],
-        "birth_date": response['birth_date'],  # converto la data in stringa ISO
-        "sex": response['sex'],
-        "birth_place": response['birth_place']
-    }
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "ttl": self._ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    async def close(self):
+        await self.client.aclose()
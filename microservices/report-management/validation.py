@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -15,6 +15,32 @@ class Report(BaseModel):
     created_at: str 
 
 
+class ReportPage(BaseModel):
+    # con fields i report contengono solo i campi richiesti, quindi non vengono validati come Report
+    items: List[Dict[str, Any]]
+    next_after_id: Optional[str] = None
+
+
+class ContextReport(BaseModel):
+    date: str
+    sintomi: Optional[str] = None
+    motivazione: Optional[str] = None
+    diagnosi: Optional[str] = None
+    trattamento: Optional[str] = None
+
+
+class OlderReportsSummary(BaseModel):
+    count: int
+    first_date: Optional[str] = None
+    last_date: Optional[str] = None
+    diagnosi: List[str] = []
+
+
+class ReportContext(BaseModel):
+    reports: List[ContextReport]
+    older: Optional[OlderReportsSummary] = None
+
+
 class CreateReportRequest(BaseModel):
     patient_id: int
     social_sec_number: str
@@ -0,0 +1,39 @@
+import zipfile
+
+"""
+Scrittura di un archivio ZIP a blocchi, per inviarlo in streaming mentre viene prodotto.
+
+ZipFile scrive su questo oggetto come su un file non seekable (usa i data descriptor
+al posto di tornare indietro a correggere le intestazioni): dopo ogni file aggiunto
+i byte prodotti vengono restituiti e il buffer svuotato, quindi in memoria resta
+al massimo un file alla volta.
+"""
+
+
+class ZipStreamWriter:
+    def __init__(self, compression: int = zipfile.ZIP_STORED):
+        self._chunks = []
+        self._zip = zipfile.ZipFile(self, mode="w", compression=compression)
+
+    # interfaccia minima di file usata da ZipFile
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+    def add(self, name: str, data: bytes) -> bytes:
+        """Aggiunge un file all'archivio e restituisce i byte da inviare."""
+        self._zip.writestr(name, data)
+        return self._drain()
+
+    def close(self) -> bytes:
+        """Chiude l'archivio e restituisce la directory centrale finale."""
+        self._zip.close()
+        return self._drain()
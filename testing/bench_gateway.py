@@ -0,0 +1,121 @@
+# bench_gateway.py
+#
+# Benchmark del proxy dell'API Gateway su payload grandi.
+# Misura il picco di memoria (RSS) del processo del gateway e il time-to-first-byte
+# per upload da 50 MB su /diagnose e per il download di un PDF da /report/pdf/{report_id}.
+#
+# Per il confronto prima/dopo lanciare lo script contro il gateway avviato dalla
+# versione precedente e da quella attuale, riavviando il gateway tra le due misure
+# (il picco RSS è cumulativo per processo).
+#
+# python bench_gateway.py --gateway http://localhost:8010 --pid <pid gateway> --token <jwt paziente> [--report-id <id>]
+
+import argparse
+import asyncio
+import os
+import time
+import httpx
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def read_rss_kb(pid: int) -> dict:
+    """
+    Legge RSS attuale (VmRSS) e picco (VmHWM) del processo da /proc (solo Linux).
+    """
+    values = {}
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith(("VmRSS", "VmHWM")):
+                key, value = line.split(":")
+                values[key] = int(value.strip().split()[0])
+    return values
+
+
+async def payload_stream(size_mb: int):
+    # il payload viene generato a blocchi per non influenzare la memoria del client
+    chunk = os.urandom(CHUNK_SIZE)
+    for _ in range(size_mb):
+        yield chunk
+
+
+async def bench_upload(client: httpx.AsyncClient, gateway: str, token: str, size_mb: int):
+    boundary = "healthgatebench"
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="bench.wav"\r\n'
+        f"Content-Type: audio/wav\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    async def body():
+        yield head
+        async for chunk in payload_stream(size_mb):
+            yield chunk
+        yield tail
+
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(head) + size_mb * CHUNK_SIZE + len(tail)),
+    }
+
+    start = time.perf_counter()
+    async with client.stream("POST", f"{gateway}/diagnose", content=body(), headers=headers) as resp:
+        ttfb = None
+        async for _ in resp.aiter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+        total = time.perf_counter() - start
+    return resp.status_code, ttfb, total
+
+
+async def bench_download(client: httpx.AsyncClient, gateway: str, token: str, report_id: str):
+    headers = {"Authorization": f"Bearer {token}"}
+    start = time.perf_counter()
+    size = 0
+    async with client.stream("GET", f"{gateway}/report/pdf/{report_id}", headers=headers) as resp:
+        ttfb = None
+        async for chunk in resp.aiter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            size += len(chunk)
+        total = time.perf_counter() - start
+    return resp.status_code, ttfb, total, size
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark memoria/TTFB del proxy dell'API Gateway")
+    parser.add_argument("--gateway", default="http://localhost:8010")
+    parser.add_argument("--pid", type=int, required=True, help="PID del processo uvicorn del gateway")
+    parser.add_argument("--token", required=True, help="JWT di un paziente")
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--report-id", default=None, help="report di cui scaricare il PDF")
+    args = parser.parse_args()
+
+    print(f"RSS iniziale gateway: {read_rss_kb(args.pid)}")
+
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        for i in range(args.runs):
+            status, ttfb, total = await bench_upload(client, args.gateway, args.token, args.size_mb)
+            rss = read_rss_kb(args.pid)
+            print(
+                f"[upload {args.size_mb} MB #{i + 1}] status={status} "
+                f"ttfb={ttfb if ttfb is None else round(ttfb, 3)}s totale={total:.3f}s "
+                f"RSS={rss['VmRSS'] / 1024:.1f} MB picco={rss['VmHWM'] / 1024:.1f} MB"
+            )
+
+        if args.report_id:
+            for i in range(args.runs):
+                status, ttfb, total, size = await bench_download(client, args.gateway, args.token, args.report_id)
+                rss = read_rss_kb(args.pid)
+                print(
+                    f"[download pdf #{i + 1}] status={status} size={size / 1024:.1f} KB "
+                    f"ttfb={ttfb if ttfb is None else round(ttfb, 3)}s totale={total:.3f}s "
+                    f"RSS={rss['VmRSS'] / 1024:.1f} MB picco={rss['VmHWM'] / 1024:.1f} MB"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+# bench_pdf_render.py
+#
+# Benchmark della generazione dei PDF di report-management (export massivo).
+# Genera N PDF con dati di prova attraverso il PdfRenderPool con un numero crescente
+# di processi e stampa il throughput: con xhtml2pdf (CPU-bound) deve crescere circa
+# linearmente fino al numero di core.
+#
+# python bench_pdf_render.py [--reports 200] [--workers 1,2,4,8]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "report-management"))
+
+from pdf_pool import PdfRenderPool
+
+
+def fake_report(i: int) -> dict:
+    return {
+        "id": f"bench{i:06d}",
+        "firstname": "Mario",
+        "lastname": "Rossi",
+        "social_sec_number": "RSSMRA80A01H501U",
+        "birth_date": "1980-01-01",
+        "birth_place": "Roma",
+        "sex": "M",
+        "date": "2025-10-01",
+        "created_at": "2025-10-01T10:00:00",
+        "sintomi": "Il paziente riferisce dolore toracico e dispnea da circa due ore. " * 5,
+        "motivazione": "Sintomi compatibili con sindrome coronarica acuta secondo le linee guida. " * 3,
+        "diagnosi": "Angina instabile",
+        "trattamento": "Monitoraggio ECG, ASA 250 mg",
+    }
+
+
+async def bench(workers: int, reports: int) -> float:
+    # la coda accoglie tutto l'export: qui interessa il throughput, non il rifiuto
+    pool = PdfRenderPool(workers=workers, queue_size=reports)
+    try:
+        # un PDF per processo prima della misura: avvio dei processi e import di xhtml2pdf
+        await asyncio.gather(*(pool.render(fake_report(i)) for i in range(workers)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(pool.render(fake_report(i)) for i in range(reports)))
+        return time.perf_counter() - start
+    finally:
+        pool.shutdown()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput generazione PDF")
+    parser.add_argument("--reports", type=int, default=200)
+    parser.add_argument("--workers", default=None, help="numeri di processi separati da virgola (default 1,2,4... fino ai core)")
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    if args.workers:
+        levels = [int(w) for w in args.workers.split(",")]
+    else:
+        levels = [1]
+        while levels[-1] * 2 <= cores:
+            levels.append(levels[-1] * 2)
+
+    print(f"Core disponibili: {cores}")
+    base = None
+    for workers in levels:
+        elapsed = await bench(workers, args.reports)
+        throughput = args.reports / elapsed
+        base = base or throughput
+        print(f"processi={workers:>2} tempo={elapsed:6.2f}s throughput={throughput:6.1f} PDF/s "
+              f"speedup={throughput / base:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+# bench_report_db.py
+#
+# Benchmark del data layer di report-management: letture concorrenti dei report di un
+# paziente con PyMongo sincrono chiamato dentro le coroutine (comportamento precedente,
+# ogni query blocca l'event loop) e con il client Motor asincrono condiviso.
+#
+# Serve un mongod raggiungibile (es. docker run -p 27017:27017 mongo:7): lo script usa un
+# database temporaneo che viene eliminato a fine esecuzione. Oltre al throughput misura il
+# ritardo massimo dell'event loop, che con il driver sincrono cresce con la latenza di Mongo.
+#
+# python bench_report_db.py [--uri mongodb://localhost:27017] [--requests 2000] [--concurrency 1,16,64]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+DB_NAME = "healthgate_bench"
+
+parser = argparse.ArgumentParser(description="Benchmark PyMongo sincrono vs Motor")
+parser.add_argument("--uri", default="mongodb://localhost:27017")
+parser.add_argument("--requests", type=int, default=2000)
+parser.add_argument("--concurrency", default="1,16,64", help="livelli di concorrenza separati da virgola")
+parser.add_argument("--patients", type=int, default=100)
+parser.add_argument("--reports-per-patient", type=int, default=10)
+args = parser.parse_args()
+
+# il modulo database legge la configurazione all'import
+os.environ["MONGO_URI"] = args.uri
+os.environ["MONGO_DB_NAME"] = DB_NAME
+os.environ["MONGO_TLS"] = "false"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "report-management"))
+
+from pymongo import MongoClient
+from database import create_mongo_client, get_reports_by_patient_id
+
+
+async def sync_get_reports_by_patient_id(collection, patient_id: int):
+    # versione precedente: PyMongo sincrono dentro una coroutine
+    return list(collection.find({"patient_id": patient_id}).sort("data", 1))
+
+
+async def loop_lag_monitor(stop: asyncio.Event, interval: float = 0.005) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(get_reports, collection, concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await get_reports(collection, i % args.patients)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(loop_lag_monitor(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return elapsed, await monitor
+
+
+async def main():
+    sync_client = MongoClient(args.uri)
+    sync_collection = sync_client[DB_NAME]["reports"]
+    sync_collection.drop()
+    sync_collection.insert_many([
+        {"patient_id": p, "social_sec_number": f"SSN{p}", "date": f"2024-01-{r + 1:02d}",
+         "sintomi": "sintomi di prova", "motivazione": "", "diagnosi": "", "trattamento": "",
+         "created_at": "2024-01-01T00:00:00"}
+        for p in range(args.patients) for r in range(args.reports_per_patient)
+    ])
+    sync_collection.create_index("patient_id")
+
+    motor_client = create_mongo_client()
+    motor_collection = motor_client[DB_NAME]["reports"]
+
+    try:
+        for concurrency in [int(c) for c in args.concurrency.split(",")]:
+            for label, get_reports, collection in (
+                ("pymongo sincrono", sync_get_reports_by_patient_id, sync_collection),
+                ("motor", get_reports_by_patient_id, motor_collection),
+            ):
+                elapsed, lag = await run(get_reports, collection, concurrency)
+                print(f"[{label:<16}] concorrenza={concurrency:>3} "
+                      f"throughput={args.requests / elapsed:8.1f} req/s lag massimo event loop={lag * 1000:6.1f} ms")
+    finally:
+        sync_client.drop_database(DB_NAME)
+        sync_client.close()
+        motor_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
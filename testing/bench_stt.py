@@ -0,0 +1,69 @@
+# bench_stt.py
+#
+# Benchmark della trascrizione del servizio di ingestion.
+# Confronta il throughput del percorso "un file alla volta" con il micro-batching
+# del TranscriptionPool a 1, 8 e 32 upload concorrenti.
+#
+# python bench_stt.py --clip ../microservices/ingestion/audio/esempio.wav [--model base] [--batch-size 8] [--batch-wait-ms 50]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "ingestion"))
+
+from stt_backends import load_backend
+from stt_pool import TranscriptionPool
+
+
+async def run_concurrent(pool: TranscriptionPool, clip: str, concurrency: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.transcribe(clip) for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+async def bench(model, clip: str, batch_size: int, batch_wait_ms: float, levels: list):
+    pool = TranscriptionPool(
+        model,
+        workers=1,
+        queue_size=max(levels),
+        batch_size=batch_size,
+        batch_wait_ms=batch_wait_ms,
+    )
+    pool.start()
+
+    # prima esecuzione a vuoto per non misurare il warm-up del modello
+    await pool.transcribe(clip)
+
+    label = "un file alla volta" if batch_size == 1 else f"micro-batch (max {batch_size})"
+    for concurrency in levels:
+        elapsed = await run_concurrent(pool, clip, concurrency)
+        print(
+            f"[{label}] concorrenza={concurrency:>2} tempo={elapsed:.2f}s "
+            f"throughput={concurrency / elapsed:.2f} file/s batch medio={pool.stats()['avg_batch']}"
+        )
+
+    await pool.shutdown()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput trascrizione singola vs micro-batch")
+    parser.add_argument("--clip", required=True, help="file audio da trascrivere")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-wait-ms", type=float, default=50)
+    parser.add_argument("--levels", default="1,8,32", help="livelli di concorrenza separati da virgola")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    print(f"Caricamento modello Whisper '{args.model}'...")
+    model = load_backend("whisper", args.model)
+
+    await bench(model, args.clip, 1, args.batch_wait_ms, levels)
+    await bench(model, args.clip, args.batch_size, args.batch_wait_ms, levels)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
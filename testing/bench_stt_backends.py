@@ -0,0 +1,128 @@
+# bench_stt_backends.py
+#
+# Confronto dei backend di speech-to-text del servizio di ingestion.
+# Per ogni clip di una cartella locale misura real-time factor (tempo di trascrizione / durata audio)
+# e word error rate rispetto alla trascrizione di riferimento; a fine esecuzione riporta il picco
+# di memoria del processo.
+#
+# La cartella deve contenere i file audio e, per ognuno, un .txt con la trascrizione attesa
+# (es. clip01.wav + clip01.txt). Il picco di memoria è per processo: lanciare lo script una volta
+# per backend.
+#
+# python bench_stt_backends.py --clips ./clips --backend whisper --model base
+# python bench_stt_backends.py --clips ./clips --backend faster-whisper --model base --compute-type int8
+
+import argparse
+import os
+import re
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "ingestion"))
+
+from stt_backends import FasterWhisperBackend, load_backend
+
+SAMPLE_RATE = 16000
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm")
+
+
+def peak_memory_mb() -> float:
+    # su Linux ru_maxrss è espresso in KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def decode_audio(path: str):
+    """Decodifica l'audio in float32 mono a 16 kHz, fuori dalla misura del tempo di trascrizione."""
+    try:
+        import whisper
+        return whisper.load_audio(path)
+    except ImportError:
+        from faster_whisper import decode_audio as fw_decode_audio
+        return fw_decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+
+def normalize(text: str) -> list:
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return text.split()
+
+
+def word_errors(reference: list, hypothesis: list) -> int:
+    """Distanza di Levenshtein a livello di parola (sostituzioni + inserimenti + cancellazioni)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            )
+        previous = current
+    return previous[-1]
+
+
+def load_clips(folder: str) -> list:
+    clips = []
+    for name in sorted(os.listdir(folder)):
+        base, ext = os.path.splitext(name)
+        reference_path = os.path.join(folder, base + ".txt")
+        if ext.lower() in AUDIO_EXTENSIONS and os.path.exists(reference_path):
+            with open(reference_path, "r", encoding="utf-8") as f:
+                clips.append((os.path.join(folder, name), f.read().strip()))
+    return clips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RTF / memoria / WER dei backend STT")
+    parser.add_argument("--clips", required=True, help="cartella con audio e trascrizioni .txt")
+    parser.add_argument("--backend", default="whisper")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--compute-type", default="int8", help="solo faster-whisper")
+    parser.add_argument("--language", default="it")
+    args = parser.parse_args()
+
+    clips = load_clips(args.clips)
+    if not clips:
+        print("Nessuna clip con trascrizione di riferimento trovata.")
+        return
+
+    options = {"compute_type": args.compute_type} if args.backend == FasterWhisperBackend.name else {}
+    start = time.perf_counter()
+    backend = load_backend(args.backend, args.model, **options)
+    print(f"Backend {args.backend} ({args.model}) caricato in {time.perf_counter() - start:.1f}s, "
+          f"memoria {peak_memory_mb():.0f} MB")
+
+    # prima trascrizione a vuoto per escludere il warm-up
+    backend.transcribe(decode_audio(clips[0][0]), language=args.language)
+
+    total_audio, total_time, total_errors, total_words = 0.0, 0.0, 0, 0
+    for path, reference in clips:
+        audio = decode_audio(path)
+        duration = len(audio) / SAMPLE_RATE
+
+        start = time.perf_counter()
+        text = backend.transcribe(audio, language=args.language)
+        elapsed = time.perf_counter() - start
+
+        ref_words = normalize(reference)
+        errors = word_errors(ref_words, normalize(text))
+
+        total_audio += duration
+        total_time += elapsed
+        total_errors += errors
+        total_words += len(ref_words)
+
+        print(f"[{os.path.basename(path)}] durata={duration:.1f}s RTF={elapsed / duration:.3f} "
+              f"WER={errors / max(len(ref_words), 1):.3f}")
+
+    print("-" * 60)
+    print(f"Backend:        {args.backend} ({args.model})")
+    print(f"Clip:           {len(clips)} ({total_audio:.1f}s di audio)")
+    print(f"RTF medio:      {total_time / total_audio:.3f}")
+    print(f"WER:            {total_errors / max(total_words, 1):.3f}")
+    print(f"Picco memoria:  {peak_memory_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
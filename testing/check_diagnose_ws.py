@@ -0,0 +1,72 @@
+# check_diagnose_ws.py
+#
+# Verifica end to end della diagnosi vocale su WebSocket
+# (gateway /diagnose/ws -> ingestion /ingestion/ws -> decision engine):
+# invia un file audio a blocchi come farebbe il browser durante la registrazione, poi "end",
+# e controlla che la registrazione arrivi fino al Decision Engine (evento "result").
+#
+# Il token si passa come ?token= perché i browser non possono impostare l'header
+# Authorization sui WebSocket: la verifica usa gli stessi header che userebbe il frontend.
+# Servono gateway, ingestion, decision engine e aggregator attivi.
+# Esce con codice 1 se non arriva l'evento "result".
+#
+# python check_diagnose_ws.py --gateway ws://localhost:8010 --token <jwt paziente> --audio registrazione.wav
+#        [--content-type audio/wav] [--chunk-size 16000] [--timeout 300]
+
+import argparse
+import asyncio
+import json
+import mimetypes
+import sys
+import time
+from urllib.parse import urlencode
+
+import websockets
+
+parser = argparse.ArgumentParser(description="Verifica end to end di /diagnose/ws")
+parser.add_argument("--gateway", default="ws://localhost:8010")
+parser.add_argument("--token", required=True, help="JWT di un paziente")
+parser.add_argument("--audio", required=True, help="file audio (qualsiasi formato leggibile da ffmpeg, o PCM 16 bit 16 kHz)")
+parser.add_argument("--content-type", default=None, help="default: ricavato dall'estensione del file")
+parser.add_argument("--chunk-size", type=int, default=16000, help="byte per messaggio")
+parser.add_argument("--timeout", type=float, default=300, help="secondi massimi per l'intera verifica")
+args = parser.parse_args()
+
+content_type = args.content_type or mimetypes.guess_type(args.audio)[0] or ""
+
+
+async def send_audio(ws):
+    with open(args.audio, "rb") as f:
+        while chunk := f.read(args.chunk_size):
+            await ws.send(chunk)
+            # ritmo simile a una registrazione dal vivo, così i parziali arrivano mentre si invia
+            await asyncio.sleep(0.05)
+    await ws.send("end")
+
+
+async def run() -> dict:
+    url = f"{args.gateway}/diagnose/ws?{urlencode({'token': args.token, 'content_type': content_type})}"
+    start = time.perf_counter()
+    async with websockets.connect(url, max_size=None) as ws:
+        sender = asyncio.create_task(send_audio(ws))
+        last = None
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                elapsed = time.perf_counter() - start
+                detail = event.get("text") or event.get("detail") or ""
+                print(f"{elapsed:7.2f}s {event['type']:<10} {detail}"[:160]
+                      + (" (audio ancora in invio)" if not sender.done() else ""))
+                last = event
+        finally:
+            sender.cancel()
+        print(f"Connessione chiusa con codice {ws.close_code}")
+        return last
+
+
+last = asyncio.run(asyncio.wait_for(run(), args.timeout))
+if last is None or last["type"] != "result":
+    print(f"\nFAIL: ultimo evento {last!r}, atteso \"result\"")
+    sys.exit(1)
+print("\nOK: risposta del Decision Engine ricevuta")
+print(json.dumps(last["response"], ensure_ascii=False, indent=2)[:2000])
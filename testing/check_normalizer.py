@@ -0,0 +1,72 @@
+# check_normalizer.py
+#
+# Verifiche di regressione del normalizzatore locale del testo digitato (ingestion/normalizer.py):
+# - i testi con parole scritte male devono restare sotto la soglia e passare alla correzione LLM
+# - il lessico non deve sostituire le espressioni del paziente rompendo la frase
+#   (il termine clinico viene aggiunto tra parentesi)
+# - i testi puliti devono restare sopra la soglia e non chiamare l'LLM
+#
+# Non servono servizi attivi. Esce con codice 1 se una verifica fallisce.
+#
+# python check_normalizer.py [--threshold 0.8]
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "ingestion"))
+
+from normalizer import normalize_typed_text
+
+parser = argparse.ArgumentParser(description="Verifiche del normalizzatore del testo digitato")
+parser.add_argument("--threshold", type=float, default=0.8, help="NORMALIZER_MIN_CONFIDENCE del servizio")
+args = parser.parse_args()
+
+# testo -> deve andare all'LLM (confidenza sotto la soglia)
+MISSPELLED = [
+    "dolre al peto da ieri sera e febre alta",
+    "ho la tose sseca e mal di gloa",
+    "mi fa male la panca da stamatina",
+]
+
+# testo -> testo normalizzato atteso
+EXPECTED = {
+    "Non riesco a respirare bene da stamattina": "Non riesco a respirare (dispnea) bene da stamattina.",
+    "ho il fiatone quando salgo le scale": "Ho il fiatone (dispnea) quando salgo le scale.",
+    "Dolore al petto e difficoltà a respirare": "Dolore al petto (dolore toracico) e difficoltà a respirare (dispnea).",
+    "sono svenuta stamattina": "Sono svenuta (sincope) stamattina.",
+    "Ho febbre alta e tosse secca": "Ho febbre alta e tosse secca.",
+}
+
+# testi puliti che non devono chiamare l'LLM
+CLEAN = [
+    "Ho febbre alta e tosse secca",
+    "mi gira la testa quando mi alzo dal letto",
+    "ho preso una tachipirina ma la febbre non passa",
+    "ho mal di testa da due giorni e un po' di nausea",
+]
+
+failures = 0
+
+
+def check(ok: bool, message: str):
+    global failures
+    print(("OK   " if ok else "FAIL ") + message)
+    if not ok:
+        failures += 1
+
+
+for text in MISSPELLED:
+    normalized, confidence = normalize_typed_text(text)
+    check(confidence < args.threshold, f"{text!r}: confidenza {confidence:.2f} (deve andare all'LLM)")
+
+for text, expected in EXPECTED.items():
+    normalized, _ = normalize_typed_text(text)
+    check(normalized == expected, f"{text!r} -> {normalized!r}" + ("" if normalized == expected else f" (atteso {expected!r})"))
+
+for text in CLEAN:
+    normalized, confidence = normalize_typed_text(text)
+    check(confidence >= args.threshold, f"{text!r}: confidenza {confidence:.2f} (normalizzatore locale)")
+
+print(f"\n{failures} verifiche fallite" if failures else "\nTutte le verifiche superate")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,77 @@
+# check_patient_context.py
+#
+# Verifiche del calcolo di età e fascia d'età nel contesto paziente (aggregator/patient_context.py):
+# - l'età cambia il giorno del compleanno, non prima
+# - i nati il 29 febbraio compiono gli anni il 1° marzo negli anni non bisestili
+# - i cambi di fascia avvengono ai limiti di AGE_BRACKETS
+# - la copia di patient_context.py nel decision engine è identica a quella dell'aggregator
+#
+# La data è fissata con un FixedClock, quindi i risultati non dipendono dal giorno in cui si lancia.
+# Non servono servizi attivi. Esce con codice 1 se una verifica fallisce.
+#
+# python check_patient_context.py
+
+import filecmp
+import os
+import sys
+from datetime import date
+
+MICROSERVICES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices")
+sys.path.insert(0, os.path.join(MICROSERVICES, "aggregator"))
+
+from clock import Clock, FixedClock
+from patient_context import Demographics, PatientContext
+
+failures = 0
+
+
+def check(ok: bool, message: str):
+    global failures
+    print(("OK   " if ok else "FAIL ") + message)
+    if not ok:
+        failures += 1
+
+
+def build(birth_date: date, today: date) -> PatientContext:
+    clock = FixedClock(today)
+    demographics = Demographics(social_sec_number="RSSMRA80A01H501U", sex="M", birth_date=birth_date)
+    return PatientContext.build(1, demographics, None, today=clock.today(), missing=[])
+
+
+# (data di nascita, oggi, età attesa, fascia attesa)
+CASES = [
+    (date(1980, 6, 15), date(2024, 6, 14), 43, "adulto"),
+    (date(1980, 6, 15), date(2024, 6, 15), 44, "adulto"),
+    (date(2000, 2, 29), date(2023, 2, 28), 22, "adulto"),
+    (date(2000, 2, 29), date(2023, 3, 1), 23, "adulto"),
+    (date(2000, 2, 29), date(2024, 2, 29), 24, "adulto"),
+    (date(2010, 9, 1), date(2024, 8, 31), 13, "pediatrico"),
+    (date(2010, 9, 1), date(2024, 9, 1), 14, "adolescente"),
+    (date(2006, 1, 1), date(2024, 1, 1), 18, "adulto"),
+    (date(1959, 3, 10), date(2024, 3, 9), 64, "adulto"),
+    (date(1959, 3, 10), date(2024, 3, 10), 65, "anziano"),
+    (date(1944, 12, 31), date(2024, 12, 31), 80, "grande anziano"),
+    (date(2024, 5, 1), date(2024, 5, 1), 0, "pediatrico"),
+]
+
+for birth_date, today, age, bracket in CASES:
+    context = build(birth_date, today)
+    ok = context.age == age and context.age_bracket == bracket
+    check(ok, f"nato il {birth_date}, oggi {today}: {context.age} anni, {context.age_bracket}"
+              + ("" if ok else f" (atteso {age} anni, {bracket})"))
+
+context = PatientContext.build(1, None, None, today=FixedClock(date(2024, 1, 1)).today(), missing=["auth"])
+check(context.age is None and context.degraded, "senza anagrafica: età assente e contesto degradato")
+
+try:
+    Clock()
+    check(False, "Clock non deve essere istanziabile")
+except TypeError:
+    check(True, "Clock è astratto")
+
+same = filecmp.cmp(os.path.join(MICROSERVICES, "aggregator", "patient_context.py"),
+                   os.path.join(MICROSERVICES, "decision-engine", "patient_context.py"), shallow=False)
+check(same, "patient_context.py identico in aggregator e decision-engine")
+
+print(f"\n{failures} verifiche fallite" if failures else "\nTutte le verifiche superate")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,75 @@
+# check_report_indexes.py
+#
+# Verifica con explain() che le query di report-management usino gli indici creati
+# all'avvio (ensure_indexes): per ogni query il piano vincente deve contenere un IXSCAN
+# e nessun COLLSCAN né SORT in memoria.
+#
+# Serve un mongod raggiungibile (es. docker run -p 27017:27017 mongo:7); viene usato un
+# database temporaneo eliminato a fine esecuzione. Esce con codice 1 se una verifica fallisce.
+#
+# python check_report_indexes.py [--uri mongodb://localhost:27017]
+
+import argparse
+import asyncio
+import os
+import sys
+
+DB_NAME = "healthgate_index_check"
+
+parser = argparse.ArgumentParser(description="Verifica degli indici della collection reports")
+parser.add_argument("--uri", default="mongodb://localhost:27017")
+args = parser.parse_args()
+
+os.environ["MONGO_URI"] = args.uri
+os.environ["MONGO_DB_NAME"] = DB_NAME
+os.environ["MONGO_TLS"] = "false"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "report-management"))
+
+from database import create_mongo_client, ensure_indexes, CONTEXT_FIELDS
+
+
+def stages(plan: dict) -> list:
+    """Nomi degli stage del piano, dal più esterno al più interno."""
+    names = [plan["stage"]]
+    for child in plan.get("inputStages", []) + ([plan["inputStage"]] if "inputStage" in plan else []):
+        names += stages(child)
+    return names
+
+
+async def main():
+    client = create_mongo_client()
+    db = client[DB_NAME]
+    collection = db["reports"]
+    await collection.insert_many([
+        {"patient_id": p, "social_sec_number": f"SSN{p}", "date": f"2024-01-{r + 1:02d}",
+         "sintomi": "", "motivazione": "", "diagnosi": "", "trattamento": "", "created_at": f"2024-01-{r + 1:02d}T00:00:00"}
+        for p in range(50) for r in range(10)
+    ])
+    await ensure_indexes(db)
+
+    projection = {"_id": 0, **{field: 1 for field in CONTEXT_FIELDS}}
+    queries = {
+        "reports per patient_id": collection.find({"patient_id": 7}).sort("date", 1),
+        "reports per social_sec_number": collection.find({"social_sec_number": "SSN7"}).sort("date", 1),
+        "contesto (ultimi N)": collection.find({"patient_id": 7}, projection).sort("date", -1).limit(5),
+        "reports per created_at": collection.find().sort("created_at", -1).limit(20),
+    }
+
+    failed = False
+    try:
+        for label, cursor in queries.items():
+            plan = (await cursor.explain())["queryPlanner"]["winningPlan"]
+            plan = plan.get("queryPlan", plan)  # formato di explain dei mongod con slot-based engine
+            names = stages(plan)
+            ok = "IXSCAN" in names and "COLLSCAN" not in names and "SORT" not in names
+            failed |= not ok
+            print(f"[{'OK' if ok else 'FAIL'}] {label}: {' <- '.join(names)}")
+    finally:
+        await client.drop_database(DB_NAME)
+        client.close()
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
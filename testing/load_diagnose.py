@@ -0,0 +1,55 @@
+# load_diagnose.py
+#
+# Load test del percorso di diagnosi (gateway -> ingestion -> decision engine).
+# Invia prima una singola diagnosi testuale, poi N diagnosi concorrenti, e confronta i tempi:
+# con le chiamate LLM asincrone le N richieste devono terminare in un tempo vicino a quello
+# di una sola (finché N non supera LLM_MAX_CONCURRENCY dei servizi).
+#
+# I testi vengono resi diversi tra loro per non colpire la cache delle correzioni dell'ingestion.
+#
+# python load_diagnose.py --gateway http://localhost:8010 --token <jwt paziente> [--concurrency 8]
+
+import argparse
+import asyncio
+import time
+import httpx
+
+SINTOMI = "Ho mal di testa forte da due giorni e un po' di febbre, richiesta numero {n}"
+
+
+async def diagnose(client: httpx.AsyncClient, gateway: str, token: str, n: int) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        f"{gateway}/diagnose",
+        data={"text": SINTOMI.format(n=n)},
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test diagnosi concorrenti")
+    parser.add_argument("--gateway", default="http://localhost:8010")
+    parser.add_argument("--token", required=True, help="JWT di un paziente")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(timeout=300) as client:
+        single = await diagnose(client, args.gateway, args.token, 0)
+        print(f"Diagnosi singola:        {single:.2f}s")
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(
+            *(diagnose(client, args.gateway, args.token, n) for n in range(1, args.concurrency + 1))
+        )
+        total = time.perf_counter() - start
+
+    print(f"{args.concurrency} diagnosi concorrenti: {total:.2f}s "
+          f"(latenza media {sum(latencies) / len(latencies):.2f}s, max {max(latencies):.2f}s)")
+    print(f"Rapporto rispetto alla singola: {total / single:.2f}x (sequenziale sarebbe ~{args.concurrency}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+# soak_decision_adapter.py
+#
+# Soak test del DecisionAdapter del servizio di ingestion.
+# Avvia in locale un finto Decision Engine, invia N richieste tramite l'adapter
+# e stampa il numero di file descriptor aperti dal processo ogni 1000 richieste.
+#
+# Con --mode shared viene usato un solo adapter (come nel lifespan dell'ingestion),
+# con --mode per-request viene creato un adapter nuovo per ogni richiesta senza
+# chiuderlo (comportamento precedente) per confronto.
+#
+# python soak_decision_adapter.py [--requests 10000] [--concurrency 50] [--mode shared|per-request]
+
+import argparse
+import asyncio
+import os
+import sys
+
+PORT = 8765
+
+# l'adapter legge URL e route del Decision Engine dalla configurazione dell'ingestion
+os.environ["URL_SERVICE"] = f"http://127.0.0.1:{PORT}"
+os.environ["ROUTE_SERVICE"] = "/llm/diagnose"
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "microservices", "ingestion"))
+
+import uvicorn
+from fastapi import FastAPI
+from adapter import DecisionAdapter
+
+stub = FastAPI()
+
+
+@stub.post("/llm/diagnose")
+async def fake_diagnose(data: dict):
+    return {"decisione": "Pronto soccorso non necessario", "motivazione": data.get("sintomi", "")}
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Soak test del DecisionAdapter")
+    parser.add_argument("--requests", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mode", choices=["shared", "per-request"], default="shared")
+    args = parser.parse_args()
+
+    server = uvicorn.Server(uvicorn.Config(stub, host="127.0.0.1", port=PORT, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    headers = {"X-User-Id": "1", "Authorization": "Bearer soak"}
+    output = {"corrected_text": "mal di testa lieve"}
+    shared = DecisionAdapter() if args.mode == "shared" else None
+    semaphore = asyncio.Semaphore(args.concurrency)
+    done = 0
+
+    print(f"Modalità {args.mode} - fd iniziali: {open_fds()}")
+
+    async def one():
+        nonlocal done
+        async with semaphore:
+            adapter = shared or DecisionAdapter()
+            await adapter.send(headers=headers, ingestion_output=output)
+            done += 1
+            if done % 1000 == 0:
+                print(f"[{done:>6} richieste] fd aperti: {open_fds()}")
+
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+
+    if shared is not None:
+        await shared.close()
+    print(f"fd finali: {open_fds()}")
+
+    server.should_exit = True
+    await server_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main())